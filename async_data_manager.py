@@ -0,0 +1,124 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+
+from helper.url_utils import canonicalize_url
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDataManager:
+    def __init__(self, data_manager, read_workers: int = 4, flush_interval: float = 0.05):
+        """
+        Awaitable facade over a DataManager for the FastAPI endpoints.
+
+        Reads run on a pool of `read_workers` threads and writes on a single
+        writer thread, so a read never queues behind a slow write (the
+        database runs in WAL mode, so it does not block on one either).
+        Submission status updates are coalesced: updates queued within
+        `flush_interval` seconds are written in one transaction, and only the
+        latest update per submission is kept.
+        """
+        self.data_manager = data_manager
+        self.flush_interval = flush_interval
+        self._readers = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+        self._lock = threading.Lock()
+        self._status_updates: Dict[Tuple[int, str], Tuple[str, str, Optional[Dict]]] = {}
+        self._flush_timer: Optional[threading.Timer] = None
+        self._closed = False
+
+    async def _read(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, partial(fn, *args, **kwargs))
+
+    async def _write(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, partial(fn, *args, **kwargs))
+
+    async def save_business_data(self, business_data: Dict) -> int:
+        return await self._write(self.data_manager.save_business_data, business_data)
+
+    async def add_directory_urls(self, business_id: int, directory_urls: List[str], mode: str = "skip") -> List[str]:
+        """add_directory_url for a whole upload as one writer job; returns the action per URL."""
+        def add_all():
+            return [self.data_manager.add_directory_url(business_id, url, mode=mode) for url in directory_urls]
+        return await self._write(add_all)
+
+    async def save_submission_checkpoint(self, business_id: int, directory_url: str, checkpoint: Dict = None):
+        return await self._write(self.data_manager.save_submission_checkpoint, business_id, directory_url, checkpoint)
+
+    async def get_business_data(self, business_id: int) -> Dict:
+        return await self._read(self.data_manager.get_business_data, business_id)
+
+    async def get_all_submission_statuses(self, business_id: int) -> List[Dict]:
+        return await self._read(self.data_manager.get_all_submission_statuses, business_id)
+
+    async def get_submission_summary(self, business_id: int = None, days: int = 30) -> Dict:
+        return await self._read(self.data_manager.get_submission_summary, business_id, days)
+
+    async def get_watchdog_events(self, business_id: int) -> List[Dict]:
+        return await self._read(self.data_manager.get_watchdog_events, business_id)
+
+    async def get_resumable_submissions(self) -> List[Dict]:
+        return await self._read(self.data_manager.get_resumable_submissions)
+
+    async def get_retention_runs(self, limit: int = 10) -> List[Dict]:
+        return await self._read(self.data_manager.get_retention_runs, limit)
+
+    def queue_status_update(self, business_id: int, directory_url: str, status: str,
+                            response_data: Dict = None):
+        """
+        Queue a submission status update without waiting for the disk.
+
+        Thread-safe, so browser worker threads can call it directly. A later
+        update for the same submission replaces one that is still queued.
+        After close(), e.g. a job finishing during shutdown, the update is
+        written directly instead.
+        """
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                key = (business_id, canonicalize_url(directory_url))
+                self._status_updates[key] = (directory_url, status, response_data)
+                if self._flush_timer is None:
+                    # Give concurrent updates a moment to join this batch, without
+                    # holding up the writer thread in the meantime
+                    self._flush_timer = threading.Timer(self.flush_interval, self._schedule_flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+        if closed:
+            logger.warning(f"Status update for {directory_url} after shutdown, writing it directly")
+            self.data_manager.update_submission_status(business_id, directory_url, status, response_data)
+
+    def _schedule_flush(self):
+        with self._lock:
+            # close() has flushed the queue and stopped the writer
+            if self._closed:
+                return
+            self._writer.submit(self._flush_status_updates)
+
+    def _flush_status_updates(self):
+        with self._lock:
+            queued, self._status_updates = self._status_updates, {}
+            self._flush_timer = None
+        if not queued:
+            return
+        try:
+            self.data_manager.update_submission_statuses([
+                (business_id, directory_url, status, response_data)
+                for (business_id, _), (directory_url, status, response_data) in queued.items()
+            ])
+        except Exception as e:
+            logger.error(f"Error writing {len(queued)} status updates: {str(e)}")
+
+    def close(self):
+        """Write any queued status updates and stop the worker threads."""
+        with self._lock:
+            self._closed = True
+            if self._flush_timer:
+                self._flush_timer.cancel()
+        self._writer.submit(self._flush_status_updates)
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
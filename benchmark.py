@@ -0,0 +1,500 @@
+"""
+Benchmarks for the SEO directory agent.
+
+Usage:
+    python benchmark.py browser-profile test.csv --output benchmarks/browser_profile.json
+    python benchmark.py tabs test.csv --concurrency 4
+    python benchmark.py field-matching benchmarks/form_corpus.json
+    python benchmark.py replay recordings/
+    python benchmark.py checking-memory --rows 100000
+    python benchmark.py api-load http://localhost:8000 --pollers 50 --writers 5
+    python benchmark.py startup --runs 5
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import aiohttp
+import psutil
+
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from data_manager import DataManager
+from helper.browser_profile import BrowserProfile
+from helper.field_matcher import field_matcher
+from helper.form_field import LEGACY_SYNONYMS
+from helper.waits import PageWaiter
+from page_recorder import compare, iter_recordings, load_recording, replay
+from tab_pool import TabPool
+
+logger = logging.getLogger(__name__)
+
+
+def read_urls(csv_path: str) -> List[str]:
+    """Read directory URLs from the first column of a CSV file."""
+    with open(csv_path, newline="") as f:
+        return [row[0].strip() for row in csv.reader(f) if row and row[0].strip()]
+
+
+def _bytes_transferred(driver) -> int:
+    """Sum the encoded bytes of every response from the Chrome performance log."""
+    total = 0
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        if message["method"] == "Network.loadingFinished":
+            total += int(message["params"].get("encodedDataLength", 0))
+    return total
+
+
+def measure_page(profile: BrowserProfile, url: str, timeout: int = 30) -> Dict:
+    """Load `url` with `profile` and report bytes transferred and time-to-form."""
+    options = profile.chrome_options(url)
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    driver = webdriver.Chrome(options=options)
+    try:
+        profile.apply_network_rules(driver, url)
+        start = time.perf_counter()
+        driver.get(url)
+        try:
+            WebDriverWait(driver, timeout).until(
+                lambda d: d.find_elements(By.XPATH, "//form//input | //a[@href]")
+            )
+            time_to_form = time.perf_counter() - start
+        except Exception:
+            time_to_form = None
+        return {
+            "url": url,
+            "bytes": _bytes_transferred(driver),
+            "time_to_form": time_to_form,
+        }
+    finally:
+        driver.quit()
+
+
+def bench_browser_profile(args):
+    """Compare the default and lean browser profiles on the same directories."""
+    urls = read_urls(args.csv)
+    profiles = {
+        "default": BrowserProfile(headless=True),
+        "lean": BrowserProfile.lean(),
+    }
+
+    print(f"{'url':50} {'profile':8} {'KB':>10} {'form (s)':>10}")
+    totals = {name: {"bytes": 0, "time": 0.0} for name in profiles}
+    results = []
+    for url in urls:
+        for name, profile in profiles.items():
+            try:
+                result = measure_page(profile, url, timeout=args.timeout)
+            except Exception as e:
+                logger.error(f"Error measuring {url} with {name} profile: {str(e)}")
+                continue
+            seconds = result["time_to_form"]
+            results.append(dict(result, profile=name))
+            totals[name]["bytes"] += result["bytes"]
+            totals[name]["time"] += seconds or args.timeout
+            print(f"{url[:50]:50} {name:8} {result['bytes'] / 1024:10.1f} "
+                  f"{(f'{seconds:.2f}' if seconds is not None else 'timeout'):>10}")
+
+    default, lean = totals["default"], totals["lean"]
+    savings = None
+    if default["bytes"] and default["time"]:
+        savings = {
+            "bytes_percent": round(100 * (1 - lean["bytes"] / default["bytes"]), 1),
+            "time_to_form_percent": round(100 * (1 - lean["time"] / default["time"]), 1),
+        }
+        print(f"\nlean profile: {savings['bytes_percent']:.1f}% fewer bytes, "
+              f"{savings['time_to_form_percent']:.1f}% less time-to-form")
+
+    if args.output:
+        # Timeouts count as the full timeout in the totals, as above
+        with open(args.output, "w") as f:
+            json.dump({"run_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "csv": args.csv, "timeout": args.timeout,
+                       "results": results, "totals": totals, "lean_savings": savings}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+def process_tree_memory(driver) -> int:
+    """Proportional memory (PSS, RSS where unavailable) of chromedriver and every Chrome child."""
+    root = psutil.Process(driver.service.process.pid)
+    total = 0
+    for process in [root] + root.children(recursive=True):
+        try:
+            info = process.memory_full_info()
+            total += getattr(info, "pss", info.rss)
+        except psutil.Error:
+            continue
+    return total
+
+
+def _load(driver, url: str):
+    driver.get(url)
+    PageWaiter(driver, url).wait_for_page("navigate")
+
+
+def bench_tabs(args):
+    """
+    Compare one browser per job with tabs in one browser: memory per job,
+    and wall time for all jobs' pages to load at once.
+    """
+    urls = (read_urls(args.csv) * args.concurrency)[:args.concurrency]
+    profile = BrowserProfile(headless=True)
+
+    # One browser process tree per job
+    drivers = [profile.create_driver(url) for url in urls]
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            list(executor.map(_load, drivers, urls))
+        browsers_seconds = time.perf_counter() - start
+        browsers_bytes = sum(process_tree_memory(driver) for driver in drivers)
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+    # One browser, one isolated tab per job
+    pool = TabPool(profile, max_tabs=len(urls))
+    try:
+        tabs = [pool.create_driver(url) for url in urls]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            list(executor.map(_load, tabs, urls))
+        tabs_seconds = time.perf_counter() - start
+        tabs_bytes = process_tree_memory(pool.driver)
+        for tab in tabs:
+            tab.quit()
+    finally:
+        pool.close()
+
+    gb = 1024 ** 3
+    print(f"{'model':20} {'MB total':>10} {'MB / job':>10} {'jobs / GB':>10} {'wall (s)':>10}")
+    for name, used, seconds in (("browser per job", browsers_bytes, browsers_seconds),
+                                ("tabs in one browser", tabs_bytes, tabs_seconds)):
+        print(f"{name:20} {used / 1024 ** 2:10.0f} {used / len(urls) / 1024 ** 2:10.0f} "
+              f"{len(urls) / (used / gb):10.1f} {seconds:10.2f}")
+
+
+# Location pass of the old form filler, matched case-insensitively
+LEGACY_LOCATION_VARIANTS = {
+    "city": ["town", "city", "location", "place"],
+    "state": ["state", "province", "region", "county"],
+    "zip": ["zip", "postal", "postcode"],
+    "country": ["country", "nation"],
+}
+
+
+def legacy_match(controls: List[Dict]) -> Dict[int, str]:
+    """
+    Emulate the old substring XPath filler on control descriptors.
+
+    Every synonym query writes the first control containing it, so a control
+    keeps whichever attribute was written to it last.
+    """
+    filled = {}
+    for attribute, synonyms in LEGACY_SYNONYMS.items():
+        for synonym in synonyms:
+            for tag in ("input", "textarea"):
+                for source in ("name", "id", "placeholder"):
+                    for position, control in enumerate(controls):
+                        if control["tag"] == tag and synonym in (control.get(source) or ""):
+                            filled[position] = attribute
+                            break
+    for attribute, variants in LEGACY_LOCATION_VARIANTS.items():
+        for variant in variants:
+            for position, control in enumerate(controls):
+                texts = [control.get(source) or "" for source in ("name", "id", "placeholder", "label")]
+                if any(variant in text.lower() for text in texts):
+                    filled[position] = attribute
+                    break
+    return filled
+
+
+def bench_field_matching(args):
+    """Accuracy and matching time of the field matcher vs the old substring filler."""
+    with open(args.corpus) as f:
+        forms = json.load(f)["forms"]
+
+    # The CPU time below excludes WebDriver round trips, so report those separately
+    legacy_queries = (sum(len(synonyms) for synonyms in LEGACY_SYNONYMS.values()) * 6
+                      + sum(len(variants) for variants in LEGACY_LOCATION_VARIANTS.values()))
+    matchers = {
+        "substring": (legacy_match, legacy_queries),
+        "scored": (lambda controls: {p: a for p, a, _ in field_matcher.match(controls)}, 1),
+    }
+
+    print(f"{'matcher':10} {'correct':>8} {'wrong':>6} {'missed':>7} {'accuracy':>9} {'ms / form':>10} {'queries':>8}")
+    for name, (match, queries) in matchers.items():
+        correct = wrong = missed = 0
+        for form in forms:
+            filled = match(form["controls"])
+            for position, control in enumerate(form["controls"]):
+                got = filled.get(position)
+                if got == control["expected"]:
+                    correct += 1
+                elif got is None:
+                    missed += 1
+                else:
+                    wrong += 1
+                    if args.verbose:
+                        print(f"  {name}: {form['directory']} {control['name'] or control['id']} "
+                              f"-> {got} (expected {control['expected']})")
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for form in forms:
+                match(form["controls"])
+        per_form = (time.perf_counter() - start) / (args.repeat * len(forms)) * 1000
+
+        total = correct + wrong + missed
+        print(f"{name:10} {correct:8} {wrong:6} {missed:7} {100 * correct / total:8.1f}% {per_form:10.3f} {queries:8}")
+
+
+def bench_replay(args):
+    """Replay recorded runs offline and report throughput and changed outcomes."""
+    paths = list(iter_recordings(args.directory))
+    if not paths:
+        print(f"No recordings found in {args.directory}")
+        return
+
+    pages = changed = 0
+    elapsed = 0.0
+    for path in paths:
+        recording = load_recording(path)
+        start = time.perf_counter()
+        replayed = replay(recording)
+        elapsed += time.perf_counter() - start
+        pages += len(recording["snapshots"])
+
+        changes = compare(recording, replayed)
+        if changes:
+            changed += 1
+            print(f"{path}")
+            for name, values in changes.items():
+                print(f"  {name}: recorded {values['recorded']!r}, replayed {values['replayed']!r}")
+
+    print(f"\n{len(paths)} recordings, {pages} pages replayed in {elapsed:.2f}s "
+          f"({pages / elapsed * 60 if elapsed else 0:.0f} pages/min), {changed} with changed outcomes")
+    if args.strict and changed:
+        raise SystemExit(1)
+
+
+def bench_checking_memory(args):
+    """Peak Python memory of listing-check queries: full list vs streaming iterator."""
+    db_path = tempfile.mktemp(suffix=".db")
+    try:
+        data_manager = DataManager(db_path)
+        data_manager.initialize_database()
+        # A realistic business profile is a few KB of JSON
+        business = {"company_name": "Example Co", "website_url": "https://example.com",
+                    "business_description": "x" * 2000, "keywords": ["seo"] * 50}
+        business_ids = [data_manager.save_business_data(business) for _ in range(args.businesses)]
+
+        conn = sqlite3.connect(db_path)
+        conn.executemany(
+            """
+            INSERT INTO directory_submissions
+            (business_id, directory_url, canonical_url, idempotency_key, status, created_at)
+            VALUES (?, ?, ?, ?, 'success', '')
+            """,
+            (
+                (business_ids[i % len(business_ids)], f"https://dir{i}.example",
+                 f"https://dir{i}.example", f"{business_ids[i % len(business_ids)]}:https://dir{i}.example")
+                for i in range(args.rows)
+            )
+        )
+        conn.commit()
+        conn.close()
+
+        print(f"{'api':32} {'rows':>8} {'peak MB':>9} {'seconds':>8}")
+        runs = {
+            "get_submissions_for_checking": lambda: len(data_manager.get_submissions_for_checking()),
+            "iter_submissions_for_checking": lambda: sum(1 for _ in data_manager.iter_submissions_for_checking()),
+        }
+        for name, run in runs.items():
+            tracemalloc.start()
+            start = time.perf_counter()
+            rows = run()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:32} {rows:8} {peak / 1024 ** 2:9.1f} {elapsed:8.2f}")
+    finally:
+        os.remove(db_path)
+
+
+LOAD_TEST_BUSINESS = {
+    "company_name": "Load Test Co",
+    "tagline": "Benchmarking",
+    "website_url": "https://loadtest.example",
+    "email": "owner@loadtest.example",
+    "phone": "555-0100",
+    "password": "not-a-real-password",
+    "business_description": "Business created by benchmark.py api-load",
+    "social_media_links": {},
+    "founder_name": "Load Tester",
+    "business_category": "Testing",
+    "keywords": ["benchmark"],
+    "address": "1 Test Street",
+    "location": {"city": "Testville", "state": "TS", "country": "US", "zip": "00000"},
+}
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _load_client(session: aiohttp.ClientSession, method: str, url: str, payload, deadline: float,
+                       latencies: List[float], errors: List[str]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.request(method, url, json=payload) as response:
+                await response.read()
+                if response.status >= 400:
+                    errors.append(str(response.status))
+        except aiohttp.ClientError as e:
+            errors.append(type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+
+async def _api_load(args):
+    base_url = args.base_url.rstrip("/")
+    async with aiohttp.ClientSession() as session:
+        business_id = args.business_id
+        if business_id is None:
+            async with session.post(f"{base_url}/submit-business-data", json=LOAD_TEST_BUSINESS) as response:
+                business_id = (await response.json())["business_id"]
+
+        deadline = time.perf_counter() + args.duration
+        results = {
+            "GET /status": ([], []),
+            "POST /submit-business-data": ([], []),
+        }
+        clients = [
+            _load_client(session, "GET", f"{base_url}/status/{business_id}", None, deadline, *results["GET /status"])
+            for _ in range(args.pollers)
+        ] + [
+            _load_client(session, "POST", f"{base_url}/submit-business-data", LOAD_TEST_BUSINESS, deadline,
+                         *results["POST /submit-business-data"])
+            for _ in range(args.writers)
+        ]
+        await asyncio.gather(*clients)
+
+    print(f"{'endpoint':28} {'requests':>9} {'errors':>7} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, (latencies, errors) in results.items():
+        if not latencies:
+            continue
+        print(f"{name:28} {len(latencies):9} {len(errors):7} {len(latencies) / args.duration:7.0f} "
+              f"{percentile(latencies, 0.5) * 1000:8.1f} {percentile(latencies, 0.95) * 1000:8.1f} "
+              f"{percentile(latencies, 0.99) * 1000:8.1f} {max(latencies) * 1000:8.1f}")
+
+
+def bench_api_load(args):
+    """p50/p95/p99 latency of a running API under concurrent status pollers and writers."""
+    asyncio.run(_api_load(args))
+
+
+# Imports main and runs its startup handlers in a fresh interpreter, printing timings as JSON
+STARTUP_PROBE = """
+import asyncio, json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+asyncio.run(main.app.router.startup())
+ready = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "startup": ready - imported,
+    "selenium_loaded": "selenium" in sys.modules,
+}))
+"""
+
+
+def bench_startup(args):
+    """Time from interpreter start to a served-ready app, with and without background warm-up."""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'mode':10} {'import s':>9} {'startup s':>10} {'total s':>8} {'selenium':>9}")
+    for mode, warm_up in (("api-only", "0"), ("worker", "1")):
+        runs = []
+        for _ in range(args.runs):
+            # A scratch working directory keeps the probe away from the real database and logs
+            with tempfile.TemporaryDirectory() as cwd:
+                env = dict(os.environ, WARM_UP=warm_up, WORKER=warm_up, PYTHONPATH=repo)
+                start = time.perf_counter()
+                output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], cwd=cwd, env=env,
+                                        capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                result["total"] = time.perf_counter() - start
+                runs.append(result)
+        print(f"{mode:10} {statistics.median(r['import'] for r in runs):9.3f} "
+              f"{statistics.median(r['startup'] for r in runs):10.3f} "
+              f"{statistics.median(r['total'] for r in runs):8.3f} "
+              f"{'yes' if runs[-1]['selenium_loaded'] else 'no':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    browser_profile = subparsers.add_parser("browser-profile", help="default vs lean Chrome profile")
+    browser_profile.add_argument("csv", help="CSV file with one directory URL per line")
+    browser_profile.add_argument("--timeout", type=int, default=30)
+    browser_profile.add_argument("--output", help="also write the results to this JSON file")
+    browser_profile.set_defaults(func=bench_browser_profile)
+
+    tabs = subparsers.add_parser("tabs", help="memory and load time: browser per job vs tabs")
+    tabs.add_argument("csv", help="CSV file with one directory URL per line")
+    tabs.add_argument("--concurrency", type=int, default=4)
+    tabs.set_defaults(func=bench_tabs)
+
+    field_matching = subparsers.add_parser("field-matching", help="form field matching accuracy on a corpus")
+    field_matching.add_argument("corpus", nargs="?", default="benchmarks/form_corpus.json")
+    field_matching.add_argument("--repeat", type=int, default=200)
+    field_matching.add_argument("--verbose", action="store_true", help="list every wrongly filled control")
+    field_matching.set_defaults(func=bench_field_matching)
+
+    replay_parser = subparsers.add_parser("replay", help="replay recorded runs offline and diff outcomes")
+    replay_parser.add_argument("directory", nargs="?", default="recordings")
+    replay_parser.add_argument("--strict", action="store_true", help="exit with status 1 if any outcome changed")
+    replay_parser.set_defaults(func=bench_replay)
+
+    checking_memory = subparsers.add_parser("checking-memory", help="peak memory of listing-check queries")
+    checking_memory.add_argument("--rows", type=int, default=100000)
+    checking_memory.add_argument("--businesses", type=int, default=100)
+    checking_memory.set_defaults(func=bench_checking_memory)
+
+    api_load = subparsers.add_parser("api-load", help="API latency under concurrent pollers and writers")
+    api_load.add_argument("base_url", nargs="?", default="http://localhost:8000")
+    api_load.add_argument("--pollers", type=int, default=50, help="clients polling /status")
+    api_load.add_argument("--writers", type=int, default=5, help="clients posting business data")
+    api_load.add_argument("--duration", type=float, default=30, help="seconds")
+    api_load.add_argument("--business-id", type=int, help="business to poll (one is created by default)")
+    api_load.set_defaults(func=bench_api_load)
+
+    startup = subparsers.add_parser("startup", help="API process startup time")
+    startup.add_argument("--runs", type=int, default=5)
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
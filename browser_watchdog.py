@@ -0,0 +1,250 @@
+from typing import Dict, List, Optional, Tuple
+import logging
+import os
+import threading
+import time
+import urllib.request
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Seconds each stage may take before the browser is considered hung. Stages
+# that load a page allow the 45s page-load timeout plus settling time;
+# PageWaiter cuts its waits short to finish inside the deadline.
+DEFAULT_STAGE_DEADLINES = {
+    "navigate": 90,
+    "find_link": 90,
+    "login": 90,
+    "fill": 60,
+    "captcha": 180,
+    "submit": 90,
+    "verify": 90,
+    "listing_check": 120,
+    "quit": 30,
+}
+
+# chromedriver launches Chrome with this switch, so it identifies our browsers
+WEBDRIVER_SWITCH = "--test-type=webdriver"
+
+
+class BrowserRecycleRequired(Exception):
+    """Raised at a stage boundary when the browser has outgrown its memory budget."""
+
+
+class WatchedBrowser:
+    def __init__(self, watchdog: "BrowserWatchdog", root_pid: Optional[int],
+                 business_id: Optional[int], directory_url: Optional[str], check_memory: bool = True,
+                 target: Optional[Tuple[str, str]] = None):
+        """
+        One driver under watch for the duration of a job.
+
+        `target` is the (DevTools address, target id) of a tab in a shared
+        browser; only that tab is closed when it overruns a deadline.
+        """
+        self.watchdog = watchdog
+        self.root_pid = root_pid
+        self.target = target
+        self.check_memory = check_memory
+        self.business_id = business_id
+        self.directory_url = directory_url
+        self.stage = None
+        self.deadline = None
+        self.killed_reason = None
+
+    def enter(self, stage: str, check_memory: bool = True):
+        """
+        Start the deadline for `stage`.
+
+        Also the point where memory is checked: a browser over budget is
+        recycled between stages rather than in the middle of one.
+        """
+        rss = self.watchdog.memory_usage(self.root_pid) if check_memory and self.check_memory else 0
+        if rss > self.watchdog.max_rss_bytes:
+            self.watchdog.kill(self, "memory", {"rss_mb": round(rss / 1024 ** 2), "before_stage": stage})
+            raise BrowserRecycleRequired(
+                f"Browser recycled before {stage}: {rss / 1024 ** 2:.0f} MB resident"
+            )
+        self.stage = stage
+        self.deadline = time.monotonic() + self.watchdog.stage_deadlines.get(stage, 60)
+
+    def close(self):
+        """Stop watching this driver."""
+        self.watchdog._unregister(self)
+
+
+class BrowserWatchdog:
+    def __init__(self, data_manager=None, page_load_timeout: int = 45, script_timeout: int = 30,
+                 stage_deadlines: Optional[Dict[str, int]] = None, max_rss_mb: Optional[int] = None,
+                 check_interval: float = 1.0, reap_interval: float = 60):
+        """
+        Enforce hard timeouts on browsers and recycle the ones that bloat.
+
+        A background thread kills any driver whose current stage overruns its
+        deadline, together with its Chrome children, so the blocked call in the
+        worker fails instead of hanging forever. Kills are recorded against the
+        submission through `data_manager`.
+        """
+        self.data_manager = data_manager
+        self.page_load_timeout = page_load_timeout
+        self.script_timeout = script_timeout
+        self.stage_deadlines = dict(DEFAULT_STAGE_DEADLINES)
+        self.stage_deadlines.update(stage_deadlines or {})
+        if max_rss_mb is None:
+            max_rss_mb = int(os.environ.get("BROWSER_MAX_RSS_MB", "1500"))
+        self.max_rss_bytes = max_rss_mb * 1024 ** 2
+        self.check_interval = check_interval
+        self.reap_interval = reap_interval
+        self._watched: List[WatchedBrowser] = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, driver, business_id: Optional[int] = None, directory_url: Optional[str] = None,
+              check_memory: bool = True) -> WatchedBrowser:
+        """
+        Apply hard WebDriver timeouts to `driver` and start watching it.
+
+        Tabs of a shared browser pass `check_memory=False`; their TabPool
+        recycles the browser once no tab is using it.
+        """
+        driver.set_page_load_timeout(self.page_load_timeout)
+        driver.set_script_timeout(self.script_timeout)
+
+        # Resolve the pid now; once a command hangs the driver can't be asked
+        try:
+            root_pid = driver.service.process.pid
+        except AttributeError:
+            root_pid = None
+
+        target = None
+        if hasattr(driver, "handle"):
+            # A tab of a shared browser: its window handle is its DevTools target id
+            try:
+                target = (driver.pool.driver.capabilities["goog:chromeOptions"]["debuggerAddress"], driver.handle)
+            except (AttributeError, KeyError, TypeError):
+                logger.debug("No DevTools address for tab, an overrun will restart the shared browser")
+
+        watched = WatchedBrowser(self, root_pid, business_id, directory_url, check_memory, target)
+        with self._lock:
+            self._watched.append(watched)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._monitor, name="browser-watchdog", daemon=True)
+                self._thread.start()
+        return watched
+
+    def _unregister(self, watched: WatchedBrowser):
+        with self._lock:
+            if watched in self._watched:
+                self._watched.remove(watched)
+
+    def _monitor(self):
+        last_reap = time.monotonic()
+        while True:
+            time.sleep(self.check_interval)
+            now = time.monotonic()
+            with self._lock:
+                overdue = [w for w in self._watched if w.deadline and now > w.deadline and not w.killed_reason]
+            for watched in overdue:
+                self.kill(watched, "deadline", {"stage": watched.stage})
+            if now - last_reap >= self.reap_interval:
+                self.reap_orphans()
+                last_reap = now
+
+    def _process_tree(self, root_pid: Optional[int]) -> List[psutil.Process]:
+        if not root_pid:
+            return []
+        try:
+            root = psutil.Process(root_pid)
+            return [root] + root.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def over_memory(self, driver) -> bool:
+        """The driver's process tree has outgrown the memory budget."""
+        try:
+            return self.memory_usage(driver.service.process.pid) > self.max_rss_bytes
+        except AttributeError:
+            return False
+
+    def memory_usage(self, root_pid: Optional[int]) -> int:
+        """Resident memory of chromedriver and all of its Chrome children."""
+        total = 0
+        for process in self._process_tree(root_pid):
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    def _close_target(self, target: Tuple[str, str]) -> bool:
+        """
+        Close one tab through Chrome's DevTools HTTP endpoint.
+
+        chromedriver runs one command at a time, so a CDP command sent
+        through the driver would queue behind the hung one; the endpoint
+        does not, and closing the tab makes the hung command fail.
+        """
+        address, target_id = target
+        try:
+            with urllib.request.urlopen(f"http://{address}/json/close/{target_id}", timeout=5) as response:
+                return response.status == 200
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not close tab {target_id}: {str(e)}")
+            return False
+
+    def kill(self, watched: WatchedBrowser, reason: str, detail: Optional[Dict] = None):
+        """
+        Kill a driver's whole process tree and record why.
+
+        A tab of a shared browser only has its own tab closed, so the other
+        tabs' jobs keep running; the tree is killed only if that fails.
+        """
+        watched.killed_reason = reason
+        killed = "browser"
+        if watched.target and self._close_target(watched.target):
+            killed = "tab"
+        else:
+            processes = self._process_tree(watched.root_pid)
+            for process in processes:
+                try:
+                    process.kill()
+                except psutil.Error:
+                    continue
+            psutil.wait_procs(processes, timeout=5)
+
+        logger.warning(f"Watchdog killed {killed} for {watched.directory_url} ({reason}, stage {watched.stage})")
+        self._unregister(watched)
+        if self.data_manager:
+            try:
+                self.data_manager.record_watchdog_event(
+                    business_id=watched.business_id,
+                    directory_url=watched.directory_url,
+                    stage=watched.stage,
+                    reason=reason,
+                    detail=detail
+                )
+            except Exception as e:
+                logger.error(f"Error recording watchdog event: {str(e)}")
+
+    def reap_orphans(self) -> int:
+        """Kill chromedriver processes and chromedriver-launched Chrome whose parent has died."""
+        # As PID 1 (e.g. a container entrypoint) our live browsers also have
+        # parent 1, so orphans cannot be told apart; kill() covers whole trees
+        if os.getpid() == 1:
+            return 0
+
+        reaped = 0
+        for process in psutil.process_iter(["name", "ppid", "cmdline"]):
+            try:
+                name = (process.info["name"] or "").lower()
+                if process.info["ppid"] not in (0, 1):
+                    continue
+                if name.startswith("chromedriver") or (
+                        "chrome" in name and WEBDRIVER_SWITCH in (process.info["cmdline"] or [])):
+                    process.kill()
+                    reaped += 1
+            except psutil.Error:
+                continue
+        if reaped:
+            logger.info(f"Watchdog reaped {reaped} orphaned Chrome processes")
+        return reaped
@@ -1,13 +1,36 @@
 import sqlite3
 import json
-from typing import Dict, List, Any
+import zlib
+from typing import Dict, Iterator, List, Any, Tuple
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
 import os
 from urllib.parse import urlparse
 
+from helper.url_utils import canonicalize_url, directory_domain
+
 logger = logging.getLogger(__name__)
 
+# What add_directory_url does with a directory the business already has a row for
+UPLOAD_MODES = ("skip", "refresh", "force")
+
+# Submissions that can no longer change: not queued and not part-way through an attempt
+FINISHED_SUBMISSION = "status != 'pending' AND checkpoint IS NULL AND COALESCE(updated_at, created_at) < ?"
+
+# Submissions no worker is processing; a claim not renewed for CLAIM_LEASE_SECONDS
+# was left by a worker that died and can be taken over
+UNCLAIMED_SUBMISSION = "(claimed_by IS NULL OR claimed_at < ?)"
+
+# Every checkpoint save renews a claim, and no stage runs anywhere near this long
+CLAIM_LEASE_SECONDS = 15 * 60
+
+# Columns of a submission export, in order; response_data (with page HTML) is left out
+EXPORT_COLUMNS = [
+    "id", "business_id", "directory_url", "domain", "status", "listing_status",
+    "created_at", "updated_at", "submitted_at", "live_at", "last_checked",
+]
+
 class DataManager:
     def __init__(self, db_path: str):
         """Initialize the DataManager with the path to the SQLite database."""
@@ -18,6 +41,13 @@ class DataManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # Freed pages can be returned to the OS a few at a time by the retention
+        # job; this only takes effect on a new, empty database
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        
+        # Write-ahead logging lets readers run while a write is in progress
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
         # Create businesses table to store business data
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS businesses (
@@ -43,9 +73,161 @@ class DataManager:
         )
         ''')
         
+        # Columns added after the first release; older databases are migrated in place
+        self._add_missing_columns(cursor, "directory_submissions", {
+            "checkpoint": "JSON",
+            "canonical_url": "TEXT",
+            "idempotency_key": "TEXT",
+            "domain": "TEXT",
+            "submitted_at": "TEXT",
+            "live_at": "TEXT",
+            "response_data_z": "BLOB",
+            "retention_stage": "TEXT",
+            "claimed_by": "TEXT",
+            "claimed_at": "TEXT",
+        })
+        self._backfill_idempotency_keys(cursor)
+        self._backfill_domains(cursor)
+        
+        # One live row per (business, canonical directory); rows from before
+        # idempotency keys that duplicate a newer one keep a NULL key
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_directory_submissions_idempotency_key
+        ON directory_submissions (idempotency_key) WHERE idempotency_key IS NOT NULL
+        ''')
+        
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_directory_submissions_business_id
+        ON directory_submissions (business_id)
+        ''')
+        
+        # Create directory_submissions_archive with every submission column plus
+        # archived_at; it follows new columns of directory_submissions automatically
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS directory_submissions_archive (
+            archived_at TEXT NOT NULL
+        )
+        ''')
+        cursor.execute("PRAGMA table_info(directory_submissions)")
+        self._add_missing_columns(cursor, "directory_submissions_archive", {
+            row[1]: row[2] for row in cursor.fetchall()
+        })
+        # ids come from the AUTOINCREMENT key of directory_submissions, so they
+        # stay unique; the export pages through the archive by id
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_directory_submissions_archive_id
+        ON directory_submissions_archive (id)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_directory_submissions_archive_business_id
+        ON directory_submissions_archive (business_id)
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_directory_submissions_archive_idempotency_key
+        ON directory_submissions_archive (idempotency_key)
+        ''')
+        
+        # Create retention_runs table to report what each retention run reclaimed
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS retention_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report JSON NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        ''')
+        
+        # Create directory_profiles table to cache pre-crawled directory endpoints
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS directory_profiles (
+            domain TEXT PRIMARY KEY,
+            homepage_url TEXT,
+            submit_url TEXT,
+            search_url_template TEXT,
+            search_form_action TEXT,
+            opensearch_url TEXT,
+            login_required INTEGER DEFAULT 0,
+            crawl_status TEXT,
+            crawled_at TEXT NOT NULL
+        )
+        ''')
+        
+        # Create watchdog_events table to record browsers killed for hanging or bloating
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS watchdog_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            business_id INTEGER,
+            directory_url TEXT,
+            stage TEXT,
+            reason TEXT NOT NULL,
+            detail JSON,
+            created_at TEXT NOT NULL
+        )
+        ''')
+        
+        # Create browser_sessions table to reuse encrypted directory logins
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS browser_sessions (
+            business_id INTEGER NOT NULL,
+            domain TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            expires_at TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (business_id, domain),
+            FOREIGN KEY (business_id) REFERENCES businesses (id)
+        )
+        ''')
+        
         conn.commit()
         conn.close()
         
+    def _add_missing_columns(self, cursor, table: str, columns: Dict[str, str]):
+        """Add any of `columns` (name -> type) that `table` does not have yet."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+        
+    @staticmethod
+    def _claim_cutoff() -> str:
+        return (datetime.now() - timedelta(seconds=CLAIM_LEASE_SECONDS)).isoformat()
+    
+    def _submission_key(self, business_id: int, directory_url: str):
+        """Canonical URL and idempotency key of a business's submission to a directory."""
+        canonical_url = canonicalize_url(directory_url)
+        return canonical_url, f"{business_id}:{canonical_url}"
+        
+    def _backfill_idempotency_keys(self, cursor):
+        """Key rows created before idempotency keys; among duplicates only the newest gets one."""
+        cursor.execute(
+            "SELECT id, business_id, directory_url FROM directory_submissions WHERE canonical_url IS NULL ORDER BY id DESC"
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        
+        cursor.execute("SELECT idempotency_key FROM directory_submissions WHERE idempotency_key IS NOT NULL")
+        taken = {row[0] for row in cursor.fetchall()}
+        for submission_id, business_id, directory_url in rows:
+            canonical_url, key = self._submission_key(business_id, directory_url)
+            if key in taken:
+                key = None
+            else:
+                taken.add(key)
+            cursor.execute(
+                "UPDATE directory_submissions SET canonical_url = ?, idempotency_key = ? WHERE id = ?",
+                (canonical_url, key, submission_id)
+            )
+        logger.info(f"Added idempotency keys to {len(rows)} existing submissions")
+        
+    def _backfill_domains(self, cursor):
+        """Fill the directory domain of rows created before the column existed."""
+        cursor.execute("SELECT id, directory_url FROM directory_submissions WHERE domain IS NULL")
+        cursor.executemany(
+            "UPDATE directory_submissions SET domain = ? WHERE id = ?",
+            [(directory_domain(directory_url), submission_id) for submission_id, directory_url in cursor.fetchall()]
+        )
+        
     def save_business_data(self, business_data: Dict) -> int:
         """Save business data to the database and return the business ID."""
         conn = sqlite3.connect(self.db_path)
@@ -79,41 +261,116 @@ class DataManager:
             return json.loads(row['data'])
         return None
     
-    def add_directory_url(self, business_id: int, directory_url: str):
-        """Add a directory URL for submission tracking."""
+    def add_directory_url(self, business_id: int, directory_url: str, mode: str = "skip") -> str:
+        """
+        Add a directory URL for submission tracking, at most once per business.
+
+        URLs are matched on their canonical form. When the business already
+        has a row for the directory, `mode` decides what happens to it:
+        "skip" leaves it alone, "refresh" retries it from scratch if it failed
+        or errored (pending rows are queued or in progress and are left alone),
+        and "force" resets it for a full resubmission. Rows a worker has
+        claimed are being processed right now and are skipped by both.
+        A submission moved to the archive by retention still counts: it is
+        skipped, except that "refresh" retries an archived failure and
+        "force" always submits again.
+        Returns "created", "skipped", "refreshed" or "forced"; only skipped
+        directories need no processing.
+        """
+        if mode not in UPLOAD_MODES:
+            raise ValueError(f"Unknown upload mode: {mode}")
+        
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         now = datetime.now().isoformat()
+        canonical_url, key = self._submission_key(business_id, directory_url)
+        
+        cursor.execute(
+            "SELECT status FROM directory_submissions_archive WHERE idempotency_key = ? ORDER BY id DESC LIMIT 1",
+            (key,)
+        )
+        archived = cursor.fetchone()
+        if archived and (mode == "skip" or (mode == "refresh" and archived[0] not in ("error", "failed"))):
+            conn.close()
+            return "skipped"
         
         cursor.execute(
             """
-            INSERT INTO directory_submissions 
-            (business_id, directory_url, status, created_at) 
-            VALUES (?, ?, ?, ?)
+            INSERT OR IGNORE INTO directory_submissions 
+            (business_id, directory_url, canonical_url, idempotency_key, domain, status, created_at) 
+            VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
-            (business_id, directory_url, "pending", now)
+            (business_id, directory_url, canonical_url, key, directory_domain(directory_url), "pending", now)
         )
         
+        if cursor.rowcount:
+            action = {"refresh": "refreshed", "force": "forced"}[mode] if archived else "created"
+        elif mode == "refresh":
+            cursor.execute(
+                """
+                UPDATE directory_submissions
+                SET status = 'pending', checkpoint = NULL, updated_at = ?
+                WHERE idempotency_key = ? AND status IN ('error', 'failed') AND """ + UNCLAIMED_SUBMISSION + """
+                """,
+                (now, key, self._claim_cutoff())
+            )
+            action = "refreshed" if cursor.rowcount else "skipped"
+        elif mode == "force":
+            cursor.execute(
+                """
+                UPDATE directory_submissions
+                SET status = 'pending', response_data = NULL, response_data_z = NULL, retention_stage = NULL,
+                    listing_status = 'not_found', last_checked = NULL, checkpoint = NULL,
+                    submitted_at = NULL, live_at = NULL, updated_at = ?
+                WHERE idempotency_key = ? AND """ + UNCLAIMED_SUBMISSION + """
+                """,
+                (now, key, self._claim_cutoff())
+            )
+            action = "forced" if cursor.rowcount else "skipped"
+        else:
+            action = "skipped"
+        
         conn.commit()
         conn.close()
+        
+        return action
     
     def update_submission_status(self, business_id: int, directory_url: str, 
                                 status: str, response_data: Dict = None):
         """Update the status of a directory submission."""
+        self.update_submission_statuses([(business_id, directory_url, status, response_data)])
+    
+    def update_submission_statuses(self, updates: List[tuple]):
+        """
+        Apply many (business_id, directory_url, status, response_data) updates in one transaction.
+
+        A status is written when an attempt is over, so it also releases the claim on the row.
+        """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
         now = datetime.now().isoformat()
         
-        cursor.execute(
+        # submitted_at keeps the first success, the start of time-to-live; a new
+        # payload replaces any compressed one and starts retention over
+        cursor.executemany(
             """
             UPDATE directory_submissions
-            SET status = ?, response_data = ?, updated_at = ?
-            WHERE business_id = ? AND directory_url = ?
+            SET status = :status, response_data = :response_data, updated_at = :now,
+                response_data_z = NULL, retention_stage = NULL, claimed_by = NULL, claimed_at = NULL,
+                submitted_at = CASE WHEN :status = 'success' THEN COALESCE(submitted_at, :now) ELSE submitted_at END
+            WHERE idempotency_key = :key
             """,
-            (status, json.dumps(response_data) if response_data else None, 
-             now, business_id, directory_url)
+            [
+                {
+                    "status": status,
+                    "response_data": json.dumps(response_data) if response_data else None,
+                    "now": now,
+                    "key": self._submission_key(business_id, directory_url)[1],
+                }
+                for business_id, directory_url, status, response_data in updates
+            ]
         )
         
         conn.commit()
@@ -130,15 +387,105 @@ class DataManager:
         cursor.execute(
             """
             UPDATE directory_submissions
-            SET listing_status = ?, last_checked = ?, updated_at = ?
-            WHERE business_id = ? AND directory_url = ?
+            SET listing_status = :listing_status, last_checked = :now, updated_at = :now,
+                live_at = CASE WHEN :listing_status = 'live' THEN COALESCE(live_at, :now) ELSE live_at END
+            WHERE idempotency_key = :key
+            """,
+            {"listing_status": listing_status, "now": now, "key": self._submission_key(business_id, directory_url)[1]}
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def save_submission_checkpoint(self, business_id: int, directory_url: str, checkpoint: Dict = None):
+        """Persist the resumable stage checkpoint of a submission, or clear it with None; renews its claim."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """
+            UPDATE directory_submissions
+            SET checkpoint = ?, claimed_at = CASE WHEN claimed_by IS NULL THEN NULL ELSE ? END
+            WHERE idempotency_key = ?
             """,
-            (listing_status, now, now, business_id, directory_url)
+            (json.dumps(checkpoint) if checkpoint else None, datetime.now().isoformat(),
+             self._submission_key(business_id, directory_url)[1])
         )
         
         conn.commit()
         conn.close()
     
+    def claim_submission(self, business_id: int, directory_url: str, owner: str) -> bool:
+        """
+        Claim a submission for `owner` before processing it.
+
+        The claim is taken in a single UPDATE, so of several workers (or a
+        resume and an upload in one worker) only one gets it. Returns False
+        when another claim is still live; writing a status releases it.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        now = datetime.now().isoformat()
+        cursor.execute(
+            """
+            UPDATE directory_submissions
+            SET claimed_by = ?, claimed_at = ?
+            WHERE idempotency_key = ? AND """ + UNCLAIMED_SUBMISSION,
+            (owner, now, self._submission_key(business_id, directory_url)[1], self._claim_cutoff())
+        )
+        claimed = cursor.rowcount > 0
+        
+        conn.commit()
+        conn.close()
+        
+        return claimed
+    
+    def get_submission_checkpoint(self, business_id: int, directory_url: str) -> Dict:
+        """Retrieve the stage checkpoint of a submission, if an attempt was interrupted."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT checkpoint FROM directory_submissions WHERE idempotency_key = ?",
+            (self._submission_key(business_id, directory_url)[1],)
+        )
+        row = cursor.fetchone()
+        
+        conn.close()
+        
+        if row and row['checkpoint']:
+            return json.loads(row['checkpoint'])
+        return None
+    
+    def get_resumable_submissions(self) -> List[Dict]:
+        """Submissions whose last attempt stopped part-way, e.g. because the worker restarted, and no worker has claimed."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """
+            SELECT business_id, directory_url, checkpoint
+            FROM directory_submissions
+            WHERE checkpoint IS NOT NULL AND status IN ('pending', 'error')
+              AND idempotency_key IS NOT NULL AND """ + UNCLAIMED_SUBMISSION + """
+            ORDER BY business_id, id
+            """,
+            (self._claim_cutoff(),)
+        )
+        
+        submissions = []
+        for row in cursor.fetchall():
+            submission = dict(row)
+            submission['checkpoint'] = json.loads(submission['checkpoint'])
+            submissions.append(submission)
+        
+        conn.close()
+        
+        return submissions
+    
     def get_all_submission_statuses(self, business_id: int) -> List[Dict]:
         """Get statuses of all directory submissions for a business."""
         conn = sqlite3.connect(self.db_path)
@@ -147,10 +494,10 @@ class DataManager:
         
         cursor.execute(
             """
-            SELECT directory_url, status, response_data, listing_status, 
+            SELECT directory_url, status, response_data, response_data_z, listing_status, 
                    last_checked, created_at, updated_at
             FROM directory_submissions
-            WHERE business_id = ?
+            WHERE business_id = ? AND idempotency_key IS NOT NULL
             """,
             (business_id,)
         )
@@ -160,6 +507,10 @@ class DataManager:
         statuses = []
         for row in rows:
             status_dict = dict(row)
+            # Old payloads are stored compressed by the retention job
+            compressed = status_dict.pop('response_data_z')
+            if compressed:
+                status_dict['response_data'] = zlib.decompress(compressed)
             if status_dict['response_data']:
                 status_dict['response_data'] = json.loads(status_dict['response_data'])
             statuses.append(status_dict)
@@ -168,6 +519,104 @@ class DataManager:
         
         return statuses
     
+    def get_submission_summary(self, business_id: int = None, days: int = 30,
+                               include_archived: bool = True) -> Dict:
+        """
+        Dashboard totals computed with SQL aggregates, for one business or all of them.
+
+        Returns counts by status and listing status, submissions per day for
+        the last `days` days, the success rate per directory domain and the
+        median seconds from a successful submission to a live listing.
+        Submissions moved to the archive by retention are counted unless
+        `include_archived` is False.
+        """
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        directory_submissions = "directory_submissions"
+        if include_archived:
+            columns = "business_id, idempotency_key, status, listing_status, domain, created_at, submitted_at, live_at"
+            directory_submissions = f"""(
+                SELECT {columns} FROM directory_submissions
+                UNION ALL
+                SELECT {columns} FROM directory_submissions_archive
+            )"""
+        
+        where = "idempotency_key IS NOT NULL"
+        params = []
+        if business_id:
+            where += " AND business_id = ?"
+            params.append(business_id)
+        
+        cursor.execute(f"SELECT status, COUNT(*) AS count FROM {directory_submissions} WHERE {where} GROUP BY status", params)
+        by_status = {row["status"]: row["count"] for row in cursor.fetchall()}
+        
+        cursor.execute(
+            f"SELECT listing_status, COUNT(*) AS count FROM {directory_submissions} WHERE {where} GROUP BY listing_status",
+            params
+        )
+        by_listing_status = {row["listing_status"]: row["count"] for row in cursor.fetchall()}
+        
+        cursor.execute(
+            f"""
+            SELECT substr(created_at, 1, 10) AS day, COUNT(*) AS count
+            FROM {directory_submissions}
+            WHERE {where} AND created_at >= date('now', 'localtime', ?)
+            GROUP BY day
+            ORDER BY day
+            """,
+            params + [f"-{days} days"]
+        )
+        per_day = [dict(row) for row in cursor.fetchall()]
+        
+        # Pending submissions have no outcome yet and do not count towards the rate
+        cursor.execute(
+            f"""
+            SELECT domain,
+                   COUNT(*) AS finished,
+                   SUM(status = 'success') AS succeeded,
+                   ROUND(1.0 * SUM(status = 'success') / COUNT(*), 3) AS success_rate
+            FROM {directory_submissions}
+            WHERE {where} AND status != 'pending'
+            GROUP BY domain
+            ORDER BY finished DESC, domain
+            """,
+            params
+        )
+        per_domain = [dict(row) for row in cursor.fetchall()]
+        
+        live_where = f"{where} AND live_at IS NOT NULL AND submitted_at IS NOT NULL"
+        cursor.execute(f"SELECT COUNT(*) FROM {directory_submissions} WHERE {live_where}", params)
+        live_count = cursor.fetchone()[0]
+        median_time_to_live = None
+        if live_count:
+            # Middle one or two values of the ordered durations
+            cursor.execute(
+                f"""
+                SELECT AVG(seconds) FROM (
+                    SELECT (julianday(live_at) - julianday(submitted_at)) * 86400 AS seconds
+                    FROM {directory_submissions}
+                    WHERE {live_where}
+                    ORDER BY seconds
+                    LIMIT ? OFFSET ?
+                )
+                """,
+                params + [2 - live_count % 2, (live_count - 1) // 2]
+            )
+            median_time_to_live = round(cursor.fetchone()[0])
+        
+        conn.close()
+        
+        return {
+            "total": sum(by_status.values()),
+            "by_status": by_status,
+            "by_listing_status": by_listing_status,
+            "per_day": per_day,
+            "per_domain": per_domain,
+            "median_time_to_live_seconds": median_time_to_live,
+        }
+    
     def get_submissions_for_checking(self, business_id: int = None) -> List[Dict]:
         """
         Get submissions that need to be checked for listing status.
@@ -183,6 +632,7 @@ class DataManager:
             FROM directory_submissions ds
             JOIN businesses b ON ds.business_id = b.id
             WHERE ds.status = 'success' AND ds.listing_status != 'live'
+              AND ds.idempotency_key IS NOT NULL
         """
         
         params = []
@@ -202,4 +652,454 @@ class DataManager:
             
         conn.close()
         
-        return submissions
\ No newline at end of file
+        return submissions
+
+    def iter_submissions_for_checking(self, business_id: int = None, chunk_size: int = 500,
+                                      cache_size: int = 64) -> Iterator[Dict]:
+        """
+        Stream the submissions get_submissions_for_checking returns, as compact records.
+
+        Rows are read business by business in keyset-paginated chunks of
+        `chunk_size`, and no connection is held between chunks, so a slow
+        consumer never pins a read transaction. Each record carries only what
+        a listing check needs (id, business_id, directory_url, company_name,
+        website_url, listing_status, last_checked); business profiles are
+        decoded once and kept in a small LRU cache.
+        """
+        @lru_cache(maxsize=cache_size)
+        def business_fields(business_id):
+            data = self.get_business_data(business_id)
+            if not data:
+                return None
+            return data["company_name"], data["website_url"]
+        
+        query = """
+            SELECT id, business_id, directory_url, listing_status, last_checked
+            FROM directory_submissions
+            WHERE status = 'success' AND listing_status != 'live'
+              AND idempotency_key IS NOT NULL AND (business_id, id) > (?, ?)
+        """
+        if business_id:
+            query += " AND business_id = ?"
+        query += " ORDER BY business_id, id LIMIT ?"
+        
+        last_business_id, last_id = 0, 0
+        while True:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            params = [last_business_id, last_id] + ([business_id] if business_id else []) + [chunk_size]
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            
+            conn.close()
+            
+            for row in rows:
+                fields = business_fields(row["business_id"])
+                if fields is None:
+                    continue
+                yield {
+                    "id": row["id"],
+                    "business_id": row["business_id"],
+                    "directory_url": row["directory_url"],
+                    "company_name": fields[0],
+                    "website_url": fields[1],
+                    "listing_status": row["listing_status"],
+                    "last_checked": row["last_checked"],
+                }
+            
+            if len(rows) < chunk_size:
+                return
+            last_business_id, last_id = rows[-1]["business_id"], rows[-1]["id"]
+
+    def iter_submissions(self, business_ids: List[int] = None, since: str = None, until: str = None,
+                         statuses: List[str] = None, listing_statuses: List[str] = None,
+                         include_archived: bool = False, chunk_size: int = 1000) -> Iterator[Dict]:
+        """
+        Stream submissions as EXPORT_COLUMNS dicts, for exports of any size.
+
+        Filters are optional: `business_ids`, a created_at range (`since`
+        inclusive, `until` exclusive, ISO dates or timestamps), `statuses` and
+        `listing_statuses`. With `include_archived`, submissions moved to the
+        archive by retention follow the live ones. Rows are read in id-ordered
+        keyset chunks and no connection is held between chunks.
+        """
+        conditions = ["idempotency_key IS NOT NULL", "id > ?"]
+        filters = []
+        for column, values in (("business_id", business_ids), ("status", statuses),
+                               ("listing_status", listing_statuses)):
+            if values:
+                conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+                filters.extend(values)
+        if since:
+            conditions.append("created_at >= ?")
+            filters.append(since)
+        if until:
+            conditions.append("created_at < ?")
+            filters.append(until)
+        
+        tables = ["directory_submissions"]
+        if include_archived:
+            tables.append("directory_submissions_archive")
+        
+        for table in tables:
+            query = f"""
+                SELECT {', '.join(EXPORT_COLUMNS)}
+                FROM {table}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY id
+                LIMIT ?
+            """
+            
+            last_id = 0
+            while True:
+                conn = sqlite3.connect(self.db_path)
+                conn.row_factory = sqlite3.Row
+                cursor = conn.cursor()
+                
+                cursor.execute(query, [last_id] + filters + [chunk_size])
+                rows = cursor.fetchall()
+                
+                conn.close()
+                
+                for row in rows:
+                    yield dict(row)
+                
+                if len(rows) < chunk_size:
+                    break
+                last_id = rows[-1]["id"]
+
+    def save_directory_profile(self, profile: Dict):
+        """Insert or replace the pre-crawled profile of a directory domain."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """
+            INSERT OR REPLACE INTO directory_profiles
+            (domain, homepage_url, submit_url, search_url_template, search_form_action,
+             opensearch_url, login_required, crawl_status, crawled_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (profile["domain"], profile.get("homepage_url"), profile.get("submit_url"),
+             profile.get("search_url_template"), profile.get("search_form_action"),
+             profile.get("opensearch_url"), int(bool(profile.get("login_required"))),
+             profile.get("crawl_status"), profile["crawled_at"])
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def get_directory_profile(self, domain: str) -> Dict:
+        """Retrieve the pre-crawled profile of a directory domain."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT * FROM directory_profiles WHERE domain = ?", (domain,))
+        row = cursor.fetchone()
+        
+        conn.close()
+        
+        if row:
+            profile = dict(row)
+            profile['login_required'] = bool(profile['login_required'])
+            return profile
+        return None
+    
+    def save_browser_session(self, business_id: int, domain: str, payload: bytes, expires_at: str = None):
+        """Insert or replace the encrypted browser session of a business on a directory."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        now = datetime.now().isoformat()
+        
+        cursor.execute(
+            """
+            INSERT OR REPLACE INTO browser_sessions
+            (business_id, domain, payload, expires_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (business_id, domain, payload, expires_at, now)
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def get_browser_session(self, business_id: int, domain: str) -> Dict:
+        """Retrieve the encrypted browser session of a business on a directory."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT payload, expires_at, updated_at FROM browser_sessions WHERE business_id = ? AND domain = ?",
+            (business_id, domain)
+        )
+        row = cursor.fetchone()
+        
+        conn.close()
+        
+        return dict(row) if row else None
+    
+    def delete_browser_session(self, business_id: int, domain: str):
+        """Remove the stored browser session of a business on a directory."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "DELETE FROM browser_sessions WHERE business_id = ? AND domain = ?",
+            (business_id, domain)
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def record_watchdog_event(self, business_id: int, directory_url: str, stage: str,
+                              reason: str, detail: Dict = None):
+        """Record that the watchdog killed or recycled the browser of a submission."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        now = datetime.now().isoformat()
+        
+        cursor.execute(
+            """
+            INSERT INTO watchdog_events
+            (business_id, directory_url, stage, reason, detail, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (business_id, directory_url, stage, reason, json.dumps(detail) if detail else None, now)
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def get_watchdog_events(self, business_id: int) -> List[Dict]:
+        """Get the watchdog kills recorded against a business's submissions."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            """
+            SELECT directory_url, stage, reason, detail, created_at
+            FROM watchdog_events
+            WHERE business_id = ?
+            ORDER BY id
+            """,
+            (business_id,)
+        )
+        
+        events = []
+        for row in cursor.fetchall():
+            event = dict(row)
+            if event['detail']:
+                event['detail'] = json.loads(event['detail'])
+            events.append(event)
+        
+        conn.close()
+        
+        return events
+    
+    def strip_response_payloads(self, before: str, keys: List[str], after_id: int = 0,
+                                limit: int = 500) -> Tuple[int, int, int]:
+        """
+        Drop `keys` from the response_data of finished submissions last updated before `before`.
+
+        Handles one batch of up to `limit` rows after `after_id`; returns
+        (rows, bytes saved, last id) so the caller can continue from there.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"""
+            SELECT id, response_data FROM directory_submissions
+            WHERE {FINISHED_SUBMISSION} AND retention_stage IS NULL AND response_data IS NOT NULL AND id > ?
+            ORDER BY id LIMIT ?
+            """,
+            (before, after_id, limit)
+        )
+        rows = cursor.fetchall()
+        
+        saved = 0
+        updates = []
+        for submission_id, response_data in rows:
+            payload = json.loads(response_data)
+            if isinstance(payload, dict):
+                for key in keys:
+                    payload.pop(key, None)
+            stripped = json.dumps(payload)
+            saved += len(response_data) - len(stripped)
+            updates.append((stripped, submission_id))
+        
+        cursor.executemany(
+            "UPDATE directory_submissions SET response_data = ?, retention_stage = 'stripped' WHERE id = ?",
+            updates
+        )
+        
+        conn.commit()
+        conn.close()
+        
+        return len(rows), saved, rows[-1][0] if rows else after_id
+    
+    def compress_response_payloads(self, before: str, keys: List[str], after_id: int = 0,
+                                   limit: int = 500) -> Tuple[int, int, int]:
+        """
+        Strip `keys` and zlib-compress the response_data of finished submissions last updated before `before`.
+
+        The payload moves to response_data_z unless compressing would not make
+        it smaller; get_all_submission_statuses decompresses it transparently.
+        Returns (rows, bytes saved, last id).
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            f"""
+            SELECT id, response_data FROM directory_submissions
+            WHERE {FINISHED_SUBMISSION} AND retention_stage IS NOT 'compressed'
+              AND response_data IS NOT NULL AND id > ?
+            ORDER BY id LIMIT ?
+            """,
+            (before, after_id, limit)
+        )
+        rows = cursor.fetchall()
+        
+        saved = 0
+        updates = []
+        for submission_id, response_data in rows:
+            payload = json.loads(response_data)
+            if isinstance(payload, dict):
+                for key in keys:
+                    payload.pop(key, None)
+            plain = json.dumps(payload)
+            compressed = zlib.compress(plain.encode(), 9)
+            # Payloads too small to gain from compression stay as text
+            if len(compressed) < len(plain):
+                saved += len(response_data) - len(compressed)
+                updates.append((None, compressed, submission_id))
+            else:
+                saved += len(response_data) - len(plain)
+                updates.append((plain, None, submission_id))
+        
+        cursor.executemany(
+            """
+            UPDATE directory_submissions
+            SET response_data = ?, response_data_z = ?, retention_stage = 'compressed'
+            WHERE id = ?
+            """,
+            updates
+        )
+        
+        conn.commit()
+        conn.close()
+        
+        return len(rows), saved, rows[-1][0] if rows else after_id
+    
+    def archive_submissions(self, before: str, limit: int = 500) -> int:
+        """
+        Move up to `limit` finished submissions last updated before `before` to the archive table.
+
+        Archived submissions leave the status view and the weekly listing
+        check; the summary counts them and the export can include them.
+        add_directory_url still finds them, so a re-upload does not submit
+        to the directory again.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute("PRAGMA table_info(directory_submissions)")
+        columns = ", ".join(row[1] for row in cursor.fetchall())
+        
+        cursor.execute(
+            f"SELECT id FROM directory_submissions WHERE {FINISHED_SUBMISSION} ORDER BY id LIMIT ?",
+            (before, limit)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        
+        if ids:
+            placeholders = ", ".join("?" * len(ids))
+            cursor.execute(
+                f"""
+                INSERT INTO directory_submissions_archive (archived_at, {columns})
+                SELECT ?, {columns} FROM directory_submissions WHERE id IN ({placeholders})
+                """,
+                [datetime.now().isoformat()] + ids
+            )
+            cursor.execute(f"DELETE FROM directory_submissions WHERE id IN ({placeholders})", ids)
+        
+        conn.commit()
+        conn.close()
+        
+        return len(ids)
+    
+    def get_database_stats(self) -> Dict[str, int]:
+        """Page size, page count, free pages and auto_vacuum mode of the database file."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        stats = {}
+        for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+            cursor.execute(f"PRAGMA {pragma}")
+            stats[pragma] = cursor.fetchone()[0]
+        
+        conn.close()
+        
+        return stats
+    
+    def enable_incremental_vacuum(self):
+        """Switch an existing database to incremental auto-vacuum; rewrites the file once with VACUUM."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.close()
+    
+    def incremental_vacuum(self, pages: int) -> int:
+        """Return up to `pages` free pages to the OS; returns the free pages left."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        # The pragma frees one page per step and returns no columns, so
+        # execute() would stop after the first; executescript() runs it to the end
+        cursor.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        cursor.execute("PRAGMA freelist_count")
+        remaining = cursor.fetchone()[0]
+        
+        conn.close()
+        
+        return remaining
+    
+    def checkpoint_wal(self):
+        """Copy the write-ahead log into the database and truncate the log file."""
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        conn.close()
+    
+    def record_retention_run(self, report: Dict):
+        """Store the report of a retention run."""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "INSERT INTO retention_runs (report, created_at) VALUES (?, ?)",
+            (json.dumps(report), datetime.now().isoformat())
+        )
+        
+        conn.commit()
+        conn.close()
+    
+    def get_retention_runs(self, limit: int = 10) -> List[Dict]:
+        """Reports of the most recent retention runs, newest first."""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT report FROM retention_runs ORDER BY id DESC LIMIT ?", (limit,))
+        runs = [json.loads(row['report']) for row in cursor.fetchall()]
+        
+        conn.close()
+        
+        return runs
@@ -1,92 +1,192 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from helper.form_field import form_field
+from selenium.common.exceptions import NoSuchElementException
+from helper.form_field import field_values
+from helper.field_matcher import collect_controls, field_matcher
+from helper.browser_profile import BrowserProfile
+from helper.page_analysis import find_submission_link, is_login_required, is_submission_successful
+from helper.waits import PageWaiter, element_present
 import logging
 import time
 import json
-import re
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, Optional
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
-from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# Checkpointed stages of a submission, in order
+SUBMISSION_STAGES = ["navigate", "find_link", "login", "fill", "captcha", "submit", "verify"]
+
 class DirectoryAgent:
-    def __init__(self, business_data: Dict[str, Any]):
-        """Initialize with business data for directory submissions."""
+    def __init__(self, business_data: Dict[str, Any], browser_profile: Optional[BrowserProfile] = None,
+                 business_id: Optional[int] = None, session_store=None, tab_pool=None, watchdog=None,
+                 recorder=None):
+        """
+        Initialize with business data for directory submissions.
+
+        With a `business_id` and a SessionStore, directory logins are saved and
+        restored instead of logging in from scratch every time. With a TabPool
+        the submission runs in an isolated tab of a shared browser. A
+        BrowserWatchdog enforces per-stage deadlines and memory limits. A
+        PageRecorder archives the pages of every run for offline replay.
+        """
         self.business_data = business_data
+        self.business_id = business_id
+        self.session_store = session_store
         self.captcha_api_key = os.environ.get("CAPTCHA_API_KEY", "")
         
-        # Configure Chrome options for Selenium
-        self.chrome_options = webdriver.ChromeOptions()
-        self.chrome_options.add_argument("--start-maximized")
-        self.chrome_options.add_argument("--disable-extensions")
-        self.chrome_options.add_argument("--disable-popup-blocking")
-        self.chrome_options.add_argument("--disable-notifications")
-        self.chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36")
+        # Chrome launch settings (headless, page load strategy, resource blocking)
+        self.browser_profile = browser_profile or BrowserProfile.from_env()
+        self.tab_pool = tab_pool
+        self.watchdog = watchdog
+        self.recorder = recorder
+        
+    def submit_to_directory(self, url: str, directory_profile: Optional[Dict[str, Any]] = None,
+                            checkpoint: Optional[Dict[str, Any]] = None,
+                            on_checkpoint: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Submit business to a directory and return submission results.
+
+        When a pre-crawled `directory_profile` knows the submit page, the browser
+        opens it directly instead of searching the homepage for the link.
+
+        Every completed stage (see SUBMISSION_STAGES) is reported to `on_checkpoint`
+        with the state needed to resume. Passing a previous `checkpoint` resumes
+        after its last completed stage: the submission page is opened directly,
+        the stored login session is reused and a form that was already posted is
+        only verified, never submitted twice. Form filling and the CAPTCHA are
+        redone whenever the submit did not happen, because both live in the page.
+        """
+        checkpoint = self._load_checkpoint(checkpoint)
+        state = checkpoint["state"]
+        completed = set(checkpoint["completed"])
+        screenshot_base = f"static/screenshots/{url.replace('://', '_').replace('/', '_')}"
+        
+        watched = None
+        recording = None
+        if self.recorder:
+            values = field_values(self.business_data)
+            recording = self.recorder.start("submission", url, business_id=self.business_id,
+                                            attributes=[a for a, v in values.items() if v])
+        
+        def complete(stage: Optional[str], **updates):
+            state.update(updates)
+            if stage and stage not in checkpoint["completed"]:
+                checkpoint["completed"].append(stage)
+                checkpoint["stage"] = stage
+            checkpoint["updated_at"] = datetime.now().isoformat()
+            if on_checkpoint:
+                on_checkpoint(checkpoint)
+            if watched and stage and stage != SUBMISSION_STAGES[-1]:
+                watched.enter(SUBMISSION_STAGES[SUBMISSION_STAGES.index(stage) + 1])
+        
+        # Record the attempt itself so a crash before the first stage still counts
+        complete(None)
+        
+        if completed:
+            logger.info(f"Resuming {url} after stage '{checkpoint['stage']}'")
         
-    def submit_to_directory(self, url: str) -> Dict[str, Any]:
-        """Submit business to a directory and return submission results."""
         driver = None
+        result = None
         try:
-            # Initialize Chrome driver
-            driver = webdriver.Chrome(options=self.chrome_options)
-            wait = WebDriverWait(driver, 20)
-            
-            # Navigate to URL and take initial screenshot
-            driver.get(url)
-            time.sleep(2)
-            
-            screenshot_path = f"static/screenshots/{url.replace('://', '_').replace('/', '_')}.png"
-            os.makedirs(os.path.dirname(screenshot_path), exist_ok=True)
-            driver.save_screenshot(screenshot_path)
-            
-            # Try to find submission link
-            submission_link = self._find_submission_link(driver)
-            if submission_link:
-                driver.get(submission_link)
-                time.sleep(2)
+            # Initialize Chrome driver for this directory
+            driver = (self.tab_pool or self.browser_profile).create_driver(url)
+            if self.watchdog:
+                watched = self.watchdog.watch(driver, business_id=self.business_id, directory_url=url,
+                                              check_memory=self.tab_pool is None)
+                watched.enter(next(s for s in SUBMISSION_STAGES if s not in completed))
+            waiter = PageWaiter(driver, url, watched=watched)
+            session_restored = self._restore_session(driver, url)
             
-            # Handle login if required
-            if self._is_login_required(driver):
-                logger.info(f"Login required for {url}")
-                self._handle_login(driver)
-                time.sleep(2)
-            
-            # Fill the directory form
-            form_data = self._fill_directory_form(driver)
-            
-            # Handle CAPTCHA if present
-            captcha_result = self._handle_captcha(driver)
-            
-            # Submit the form
-            submit_result = self._submit_form(driver)
-            time.sleep(3)
+            if "submit" in completed:
+                # The form was already posted; only verification is left
+                driver.get(state.get("post_submit_url") or state["submission_url"])
+                waiter.wait_for_page("navigate")
+            else:
+                if "find_link" in completed:
+                    driver.get(state["submission_url"])
+                    waiter.wait_for_page("navigate")
+                else:
+                    submit_url = directory_profile.get("submit_url") if directory_profile else None
+                    
+                    # Navigate to URL and take initial screenshot
+                    driver.get(submit_url or url)
+                    waiter.wait_for_page("navigate")
+                    if recording:
+                        recording.snapshot(driver, "navigate")
+                    
+                    screenshot_path = f"{screenshot_base}.png"
+                    os.makedirs(os.path.dirname(screenshot_path), exist_ok=True)
+                    driver.save_screenshot(screenshot_path)
+                    complete("navigate", initial_screenshot=screenshot_path)
+                    
+                    # Try to find submission link
+                    submission_link = None if submit_url else self._find_submission_link(driver)
+                    if recording and not submit_url:
+                        recording.record(submission_link=submission_link)
+                    if submission_link:
+                        driver.get(submission_link)
+                        waiter.wait_for_page("submission_page")
+                    complete("find_link", submission_url=driver.current_url)
+                
+                # Handle login if required; a restored session normally skips this
+                login_required = self._is_login_required(driver)
+                if recording:
+                    recording.snapshot(driver, "submission_page")
+                    recording.record(login_required=login_required)
+                if login_required:
+                    if session_restored:
+                        logger.info(f"Stored session for {url} is no longer valid, logging in again")
+                        self.session_store.invalidate(self.business_id, url)
+                    logger.info(f"Login required for {url}")
+                    if self._handle_login(driver, waiter) and not self._is_login_required(driver):
+                        self._save_session(driver, url)
+                complete("login")
+                
+                # Forms rendered by script can show up after the network went quiet
+                waiter.wait("form", element_present(
+                    By.XPATH, "//input[@type='text' or @type='email' or not(@type)] | //textarea"
+                ))
+                
+                # Fill the directory form
+                form_data = self._fill_directory_form(driver, recording)
+                complete("fill", form_data=form_data)
+                
+                # Handle CAPTCHA if present
+                captcha_result = self._handle_captcha(driver, waiter)
+                complete("captcha", captcha_solved=captcha_result.get("solved", False) if captcha_result else False)
+                
+                # Submit the form
+                submit_result = self._submit_form(driver, waiter)
+                complete("submit", submitted=submit_result, post_submit_url=driver.current_url)
             
             # Take confirmation screenshot
-            confirmation_screenshot = f"static/screenshots/{url.replace('://', '_').replace('/', '_')}_confirmation.png"
+            confirmation_screenshot = f"{screenshot_base}_confirmation.png"
+            os.makedirs(os.path.dirname(confirmation_screenshot), exist_ok=True)
             driver.save_screenshot(confirmation_screenshot)
             
             # Verify submission success
             success = self._verify_submission_success(driver)
+            if recording:
+                recording.snapshot(driver, "result")
+                recording.record(success=success)
+            complete("verify", success=success)
             
             result = {
                 "status": "success" if success else "failed",
                 "url": url,
                 "timestamp": datetime.now().isoformat(),
                 "screenshots": {
-                    "initial": screenshot_path,
+                    "initial": state.get("initial_screenshot"),
                     "confirmation": confirmation_screenshot
                 },
-                "form_data": form_data,
-                "captcha_solved": captcha_result.get("solved", False) if captcha_result else False,
-                "html_content": driver.page_source
+                "form_data": state.get("form_data", {}),
+                "captcha_solved": state.get("captcha_solved", False),
+                "html_content": driver.page_source,
+                "wait_timings": waiter.timings,
+                "skipped_stages": sorted(completed, key=SUBMISSION_STAGES.index)
             }
             
         except Exception as e:
@@ -95,58 +195,69 @@ class DirectoryAgent:
                 "status": "error",
                 "url": url,
                 "error": str(e),
+                "stage": checkpoint["stage"],
                 "timestamp": datetime.now().isoformat()
             }
             
-            if driver:
-                error_screenshot = f"static/screenshots/{url.replace('://', '_').replace('/', '_')}_error.png"
+            if watched and watched.killed_reason:
+                # The browser is gone; there is nothing left to screenshot
+                result["error"] = f"Browser killed by watchdog ({watched.killed_reason}) during {watched.stage}"
+                result["watchdog"] = watched.killed_reason
+            elif driver:
+                error_screenshot = f"{screenshot_base}_error.png"
                 driver.save_screenshot(error_screenshot)
                 result["screenshots"] = {"error": error_screenshot}
         
         finally:
+            if recording:
+                recording.record(status=result["status"] if result else "error")
+                recording.save(driver)
             if driver:
-                driver.quit()
+                self._quit_driver(driver, watched)
         
         return result
     
+    def _quit_driver(self, driver, watched=None):
+        """Quit the driver, still under watch so a hanging quit gets killed too."""
+        try:
+            if watched and not watched.killed_reason:
+                watched.enter("quit", check_memory=False)
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting driver: {str(e)}")
+        finally:
+            if watched:
+                watched.close()
+    
+    def _load_checkpoint(self, checkpoint: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Copy a stored checkpoint, or start a new one, and count this attempt."""
+        checkpoint = json.loads(json.dumps(checkpoint)) if checkpoint else {}
+        checkpoint.setdefault("completed", [])
+        checkpoint.setdefault("state", {})
+        checkpoint.setdefault("stage", None)
+        checkpoint["attempts"] = checkpoint.get("attempts", 0) + 1
+        return checkpoint
+    
+    def _restore_session(self, driver, url: str) -> bool:
+        """Load a stored login for this directory into a fresh driver."""
+        if not self.session_store or self.business_id is None:
+            return False
+        return self.session_store.restore(driver, self.business_id, url)
+    
+    def _save_session(self, driver, url: str):
+        """Persist the session after a successful login."""
+        if self.session_store and self.business_id is not None:
+            self.session_store.save(driver, self.business_id, url)
+    
     def _find_submission_link(self, driver):
         """Find the link to submit a business to the directory."""
-        potential_texts = [
-            "submit", "add", "list", "submit your site", "add your site", 
-            "submit business", "add business", "add listing", "submit listing"
-        ]
-        
-        for text in potential_texts:
-            try:
-                elements = driver.find_elements(By.XPATH, f"//a[contains(translate(., 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{text.lower()}')]")
-                if elements:
-                    return elements[0].get_attribute("href")
-            except NoSuchElementException:
-                continue
-        
-        return None
+        return find_submission_link(BeautifulSoup(driver.page_source, "html.parser"), driver.current_url)
     
     def _is_login_required(self, driver):
         """Check if login is required before submission."""
-        login_indicators = [
-            "login", "sign in", "log in", "signin", "log-in",
-            "register", "sign up", "signup", "create account"
-        ]
-        
-        page_content = driver.page_source.lower()
-        
-        for indicator in login_indicators:
-            if indicator in page_content:
-                try:
-                    login_form = driver.find_elements(By.XPATH, "//form[.//input[@type='password']]")
-                    if login_form:
-                        return True
-                except NoSuchElementException:
-                    continue
-        
-        return False
+        return is_login_required(BeautifulSoup(driver.page_source, "html.parser"))
     
-    def _handle_login(self, driver):
+    def _handle_login(self, driver, waiter: PageWaiter):
         """Attempt to login using business credentials."""
         try:
             email_fields = driver.find_elements(By.XPATH, "//input[@type='email' or contains(@name, 'email') or contains(@id, 'email')]")
@@ -160,195 +271,43 @@ class DirectoryAgent:
             
             submit_buttons = driver.find_elements(By.XPATH, "//button[@type='submit'] | //input[@type='submit']")
             if submit_buttons:
+                current_url = driver.current_url
                 submit_buttons[0].click()
-                time.sleep(3)
+                waiter.wait_for_navigation("login", current_url, submit_buttons[0])
             
             return True
         except Exception as e:
             logger.error(f"Error during login: {str(e)}")
             return False
     
-    
-        """Fill out directory submission form with business data."""
+    def _fill_directory_form(self, driver, recording=None):
+        """
+        Fill out directory submission form with business data.
+
+        All text controls are read in one script call and scored against the
+        precompiled synonym index, so every control gets at most one business
+        attribute and is written exactly once.
+        """
         form_data = {}
         
-        field_mappings = {
-            "name": self.business_data["company_name"],
-            "title": self.business_data["company_name"],
-            "company": self.business_data["company_name"],
-            "business": self.business_data["company_name"],
-            "url": self.business_data["website_url"],
-            "website": self.business_data["website_url"],
-            "site": self.business_data["website_url"],
-            "email": self.business_data["email"],
-            "phone": self.business_data["phone"],
-            "description": self.business_data["business_description"],
-            "about": self.business_data["business_description"],
-            "category": self.business_data["business_category"],
-            "keywords": ", ".join(self.business_data["keywords"]),
-            "tags": ", ".join(self.business_data["keywords"]),
-            "address": self.business_data["address"],
-            "city": self.business_data["location"].get("city", ""),
-            "state": self.business_data["location"].get("state", ""),
-            "country": self.business_data["location"].get("country", ""),
-            "zip": self.business_data["location"].get("zip", ""),
-            "postal": self.business_data["location"].get("zip", ""),
-            "facebook": self.business_data["social_media_links"].get("facebook", ""),
-            "twitter": self.business_data["social_media_links"].get("twitter", ""),
-            "linkedin": self.business_data["social_media_links"].get("linkedin", ""),
-            "instagram": self.business_data["social_media_links"].get("instagram", ""),
-            "founder": self.business_data["founder_name"],
-            "owner": self.business_data["founder_name"],
-        }
+        values = {attribute: value for attribute, value in field_values(self.business_data).items() if value}
+        controls = collect_controls(driver)
         
-        # Fill text inputs
-        for field_key, value in field_mappings.items():
-            xpaths = [
-                f"//input[contains(@name, '{field_key}')]",
-                f"//input[contains(@id, '{field_key}')]",
-                f"//input[contains(@placeholder, '{field_key}')]",
-                f"//textarea[contains(@name, '{field_key}')]",
-                f"//textarea[contains(@id, '{field_key}')]",
-                f"//textarea[contains(@placeholder, '{field_key}')]"
-            ]
-            
-            for xpath in xpaths:
-                try:
-                    elements = driver.find_elements(By.XPATH, xpath)
-                    for element in elements:
-                        input_type = element.get_attribute("type") or ""
-                        if input_type.lower() not in ["submit", "button", "hidden", "checkbox", "radio"]:
-                            element.clear()
-                            element.send_keys(str(value))
-                            name = element.get_attribute("name") or element.get_attribute("id") or ""
-                            form_data[name] = value
-                except Exception as e:
-                    logger.debug(f"Error filling field {field_key}: {str(e)}")
+        matches = field_matcher.match(controls, values)
+        if recording:
+            recording.snapshot(driver, "form", controls=controls)
+            recording.record(fields=[[controls[p]["name"] or controls[p]["id"], a] for p, a, _ in matches])
         
-        # Handle category dropdowns
-        try:
-            select_elements = driver.find_elements(By.XPATH, "//select[contains(@name, 'category') or contains(@id, 'category')]")
-            for select in select_elements:
-                options = select.find_elements(By.TAG_NAME, "option")
-                
-                best_match = None
-                for option in options:
-                    option_text = option.text
-                    if self.business_data["business_category"].lower() in option_text.lower():
-                        best_match = option.get_attribute("value")
-                        break
-                
-                if not best_match:
-                    for option in options:
-                        value = option.get_attribute("value")
-                        if value and value != "0" and value != "-1":
-                            best_match = value
-                            break
-                
-                if best_match:
-                    from selenium.webdriver.support.ui import Select
-                    dropdown = Select(select)
-                    dropdown.select_by_value(best_match)
-                    name = select.get_attribute("name") or select.get_attribute("id") or ""
-                    form_data[name] = best_match
-        except Exception as e:
-            logger.debug(f"Error handling category select: {str(e)}")
-        
-        # Handle checkboxes (like terms and conditions)
-        try:
-            checkboxes = driver.find_elements(By.XPATH, "//input[@type='checkbox']")
-            for checkbox in checkboxes:
-                checkbox_id = checkbox.get_attribute("id") or ""
-                checkbox_name = checkbox.get_attribute("name") or ""
-                
-                if ("term" in checkbox_id.lower() or "agree" in checkbox_id.lower() or 
-                    "accept" in checkbox_id.lower() or "consent" in checkbox_id.lower()):
-                    if not checkbox.is_selected():
-                        checkbox.click()
-                    form_data[checkbox_name or checkbox_id] = True
-                elif ("term" in checkbox_name.lower() or "agree" in checkbox_name.lower() or 
-                      "accept" in checkbox_name.lower() or "consent" in checkbox_name.lower()):
-                    if not checkbox.is_selected():
-                        checkbox.click()
-                    form_data[checkbox_name] = True
-        except Exception as e:
-            logger.debug(f"Error handling checkboxes: {str(e)}")
-        
-        return form_data
-    
-    def _fill_directory_form(self, driver):
-        form_data = {}
-        
-        field_mappings = form_field(self.business_data)
-        
-        def try_fill_element(element, value):
-            """Helper function to safely fill an element"""
+        for position, attribute, score in matches:
+            control = controls[position]
             try:
-                element.clear()
-                element.send_keys(str(value))
-                name = element.get_attribute("name") or element.get_attribute("id") or ""
-                form_data[name] = value
-                return True
+                control["element"].clear()
+                control["element"].send_keys(str(values[attribute]))
+                form_data[control["name"] or control["id"]] = values[attribute]
             except Exception as e:
-                logger.debug(f"Error filling field: {str(e)}")
-                return False
-
-        # First pass: Try exact matches
-        for field_key, value in field_mappings.items():
-            if not value:  # Skip empty values
-                continue
-                
-            xpaths = [
-                f"//input[contains(@name, '{field_key}')]",
-                f"//input[contains(@id, '{field_key}')]",
-                f"//input[contains(@placeholder, '{field_key}')]",
-                f"//textarea[contains(@name, '{field_key}')]",
-                f"//textarea[contains(@id, '{field_key}')]",
-                f"//textarea[contains(@placeholder, '{field_key}')]"
-            ]
-            
-            for xpath in xpaths:
-                try:
-                    elements = driver.find_elements(By.XPATH, xpath)
-                    for element in elements:
-                        input_type = element.get_attribute("type") or ""
-                        if input_type.lower() not in ["submit", "button", "hidden", "checkbox", "radio"]:
-                            if try_fill_element(element, value):
-                                break  # Move to next field if successful
-                except Exception:
-                    continue
-
-        # Second pass: Try more flexible matching for location fields
-        location_fields = {
-            "city": ["town", "city", "location", "place"],
-            "state": ["state", "province", "region", "county"],
-            "zip": ["zip", "postal", "postcode"],
-            "country": ["country", "nation"]
-        }
-
-        for field_type, variants in location_fields.items():
-            value = self.business_data["location"].get(field_type, "")
-            if not value:
-                continue
-                
-            # Try each variant pattern
-            for variant in variants:
-                xpath = f"//*[contains(translate(@name, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{variant}')] | " \
-                        f"//*[contains(translate(@id, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{variant}')] | " \
-                        f"//*[contains(translate(@placeholder, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{variant}')] | " \
-                        f"//label[contains(translate(text(), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'), '{variant}')]/following-sibling::input"
-                
-                try:
-                    elements = driver.find_elements(By.XPATH, xpath)
-                    for element in elements:
-                        input_type = element.get_attribute("type") or ""
-                        if input_type.lower() not in ["submit", "button", "hidden", "checkbox", "radio"]:
-                            if try_fill_element(element, value):
-                                break  # Move to next field if successful
-                except Exception:
-                    continue
+                logger.debug(f"Error filling field {control['name'] or control['id']} with {attribute}: {str(e)}")
 
-        # Handle dropdowns (same as before)
+        # Handle category dropdowns
         try:
             select_elements = driver.find_elements(By.XPATH, "//select[contains(@name, 'category') or contains(@id, 'category')]")
             for select in select_elements:
@@ -377,7 +336,7 @@ class DirectoryAgent:
         except Exception as e:
             logger.debug(f"Error handling category select: {str(e)}")
 
-        # Handle checkboxes (same as before)
+        # Handle checkboxes (like terms and conditions)
         try:
             checkboxes = driver.find_elements(By.XPATH, "//input[@type='checkbox']")
             for checkbox in checkboxes:
@@ -399,7 +358,7 @@ class DirectoryAgent:
         
         return form_data
 
-    def _handle_captcha(self, driver):
+    def _handle_captcha(self, driver, waiter: PageWaiter):
         """Handle CAPTCHA challenges if present."""
         try:
             recaptcha_elements = driver.find_elements(By.XPATH, "//div[contains(@class, 'g-recaptcha') or contains(@class, 'recaptcha')]")
@@ -420,11 +379,8 @@ class DirectoryAgent:
                         response = requests.get(url, params=params)
                         data = response.json()
                         if data["status"] == 1:
-                            time.sleep(20)
-                            
                             solution_url = f"https://2captcha.com/res.php?key={self.captcha_api_key}&action=get&id={data['request']}&json=1"
-                            solution_response = requests.get(solution_url)
-                            solution_data = solution_response.json()
+                            solution_data = self._poll_captcha_solution(solution_url, waiter.timeout_for("captcha"))
                             
                             if solution_data["status"] == 1:
                                 driver.execute_script(f"""
@@ -445,7 +401,18 @@ class DirectoryAgent:
         
         return {"solved": False, "type": "none"}
     
-    def _submit_form(self, driver):
+    def _poll_captcha_solution(self, solution_url: str, timeout: float, interval: float = 5) -> Dict[str, Any]:
+        """Poll 2Captcha until the solution is ready instead of sleeping a fixed time."""
+        deadline = time.monotonic() + timeout
+        solution_data = {"status": 0, "request": "CAPCHA_NOT_READY"}
+        while time.monotonic() < deadline:
+            time.sleep(interval)
+            solution_data = requests.get(solution_url).json()
+            if solution_data["request"] != "CAPCHA_NOT_READY":
+                break
+        return solution_data
+    
+    def _submit_form(self, driver, waiter: PageWaiter):
         """Submit the filled-out form."""
         submit_xpaths = [
             "//button[@type='submit']",
@@ -461,8 +428,9 @@ class DirectoryAgent:
         for xpath in submit_xpaths:
             try:
                 submit_button = driver.find_element(By.XPATH, xpath)
+                current_url = driver.current_url
                 submit_button.click()
-                time.sleep(3)
+                waiter.wait_for_navigation("submit", current_url, submit_button)
                 return True
             except NoSuchElementException:
                 continue
@@ -471,39 +439,4 @@ class DirectoryAgent:
     
     def _verify_submission_success(self, driver):
         """Verify if the submission was successful."""
-        current_url = driver.current_url
-        page_text = driver.page_source.lower()
-        
-        success_indicators = [
-            "success", "thank", "thanks", "confirm", "confirmation", 
-            "submitted", "complete", "completed"
-        ]
-        
-        # Check URL for success indicators
-        for indicator in success_indicators:
-            if indicator in current_url.lower():
-                return True
-        
-        # Check page content for success messages
-        for indicator in success_indicators:
-            if indicator in page_text:
-                patterns = [
-                    f".*{indicator}.*submission.*",
-                    f".*submission.*{indicator}.*",
-                    f".*{indicator}.*received.*",
-                    f".*{indicator}.*added.*",
-                    f".*successfully.*{indicator}.*"
-                ]
-                
-                for pattern in patterns:
-                    if re.search(pattern, page_text):
-                        return True
-        
-        # Check for error indicators
-        error_indicators = ["error", "failed", "invalid", "wrong"]
-        for indicator in error_indicators:
-            if indicator in page_text:
-                return False
-        
-        # Default to True if no clear error indicators
-        return True
\ No newline at end of file
+        return is_submission_successful(driver.current_url, driver.page_source)
@@ -0,0 +1,139 @@
+import aiohttp
+import asyncio
+import logging
+from bs4 import BeautifulSoup
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from helper.browser_profile import USER_AGENT
+from helper.page_analysis import (
+    find_opensearch_descriptor,
+    find_search_form,
+    find_submission_link,
+    is_login_required,
+    parse_opensearch_template,
+)
+from helper.url_utils import directory_domain
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryCrawler:
+    def __init__(self, data_manager, concurrency: int = 10, timeout: int = 15,
+                 max_age: timedelta = timedelta(days=7)):
+        """
+        Pre-crawl directories over plain HTTP before any browser is started.
+
+        Profiles younger than `max_age` are reused instead of crawled again.
+        """
+        self.data_manager = data_manager
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_age = max_age
+        self.headers = {"User-Agent": USER_AGENT.split("=", 1)[1]}
+
+    async def crawl(self, urls: List[str]) -> Dict[str, Dict]:
+        """
+        Crawl every directory in `urls` concurrently and store one profile per domain.
+
+        Cached profiles are read, and new ones saved, in one worker thread
+        each, so SQLite never blocks the event loop.
+        """
+        first_urls = {}
+        for url in urls:
+            first_urls.setdefault(directory_domain(url), url)
+        cached = await asyncio.to_thread(self._load_profiles, list(first_urls))
+
+        profiles = {}
+        to_crawl = {}
+        for domain, url in first_urls.items():
+            if cached.get(domain) and self._is_fresh(cached[domain]):
+                profiles[domain] = cached[domain]
+            else:
+                to_crawl[domain] = url
+
+        if to_crawl:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            async with aiohttp.ClientSession(headers=self.headers, timeout=self.timeout) as session:
+                results = await asyncio.gather(*[
+                    self._crawl_directory(session, semaphore, domain, url)
+                    for domain, url in to_crawl.items()
+                ])
+            await asyncio.to_thread(self._save_profiles, results)
+            for profile in results:
+                profiles[profile["domain"]] = profile
+
+        logger.info(f"Directory profiles ready for {len(profiles)} domains ({len(to_crawl)} crawled)")
+        return profiles
+
+    def _load_profiles(self, domains: List[str]) -> Dict[str, Optional[Dict]]:
+        return {domain: self.data_manager.get_directory_profile(domain) for domain in domains}
+
+    def _save_profiles(self, profiles: List[Dict]):
+        for profile in profiles:
+            self.data_manager.save_directory_profile(profile)
+
+    def _is_fresh(self, profile: Dict) -> bool:
+        crawled_at = datetime.fromisoformat(profile["crawled_at"])
+        return profile["crawl_status"] == "ok" and datetime.now() - crawled_at < self.max_age
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> Optional[Tuple[BeautifulSoup, str]]:
+        async with session.get(url, allow_redirects=True) as response:
+            if response.status >= 400:
+                logger.debug(f"HTTP {response.status} fetching {url}")
+                return None
+            html = await response.text(errors="replace")
+            return BeautifulSoup(html, "html.parser"), str(response.url)
+
+    async def _crawl_directory(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                               domain: str, url: str) -> Dict:
+        """Discover the submit page, search endpoint and login requirement of one directory."""
+        profile = {
+            "domain": domain,
+            "homepage_url": url,
+            "submit_url": None,
+            "search_url_template": None,
+            "search_form_action": None,
+            "opensearch_url": None,
+            "login_required": False,
+            "crawl_status": "ok",
+            "crawled_at": datetime.now().isoformat(),
+        }
+
+        async with semaphore:
+            try:
+                fetched = await self._fetch(session, url)
+                if not fetched:
+                    profile["crawl_status"] = "unreachable"
+                    return profile
+                soup, final_url = fetched
+
+                search_form = find_search_form(soup, final_url)
+                if search_form:
+                    profile["search_form_action"] = search_form["action"]
+                    profile["search_url_template"] = search_form["template"]
+
+                # OpenSearch templates are authoritative, prefer them over a guessed form
+                opensearch_url = find_opensearch_descriptor(soup, final_url)
+                if opensearch_url:
+                    profile["opensearch_url"] = opensearch_url
+                    async with session.get(opensearch_url) as response:
+                        if response.status < 400:
+                            template = parse_opensearch_template(await response.text(errors="replace"))
+                            if template:
+                                profile["search_url_template"] = template
+
+                submit_url = find_submission_link(soup, final_url)
+                submit_soup = soup
+                if submit_url:
+                    profile["submit_url"] = submit_url
+                    fetched = await self._fetch(session, submit_url)
+                    if fetched:
+                        submit_soup = fetched[0]
+                profile["login_required"] = is_login_required(submit_soup)
+
+            except Exception as e:
+                logger.warning(f"Error pre-crawling {url}: {str(e)}")
+                profile["crawl_status"] = "error"
+
+        return profile
@@ -0,0 +1,200 @@
+from selenium import webdriver
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36"
+
+# URL patterns understood by the CDP Network.setBlockedURLs command
+RESOURCE_PATTERNS = {
+    "images": ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp", "*.avif"],
+    "media": ["*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a", "*.mov", "*.m3u8"],
+    "fonts": ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot", "*fonts.googleapis.com*", "*fonts.gstatic.com*"],
+}
+
+# Ad, analytics and social widgets that never matter for a submission.
+# reCAPTCHA (google.com / gstatic.com) is deliberately not listed.
+THIRD_PARTY_DOMAINS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "segment.io",
+    "nr-data.net",
+    "addthis.com",
+    "sharethis.com",
+]
+
+RESOURCE_KINDS = ["images", "media", "fonts", "third_party"]
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class BrowserProfile:
+    def __init__(self, headless: bool = False, page_load_strategy: str = "normal",
+                 block: Optional[List[str]] = None,
+                 blocked_domains: Optional[List[str]] = None,
+                 allow_list: Optional[Dict[str, List[str]]] = None,
+                 capture_network: bool = False):
+        """
+        Describe how Chrome is launched for a directory.
+
+        `block` lists the resource kinds to drop (images, media, fonts, third_party).
+        `allow_list` maps a directory domain to the kinds it needs loaded anyway,
+        or to ["all"] for sites that break under any blocking. `capture_network`
+        turns on Chrome's performance log so page recordings include requests.
+        """
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.block = set(block or [])
+        self.blocked_domains = list(blocked_domains if blocked_domains is not None else THIRD_PARTY_DOMAINS)
+        self.allow_list = {
+            domain.lower().lstrip("."): set(kinds)
+            for domain, kinds in (allow_list or {}).items()
+        }
+        self.capture_network = capture_network
+
+    @classmethod
+    def lean(cls, allow_list: Optional[Dict[str, List[str]]] = None) -> "BrowserProfile":
+        """Headless, eager page loads, no images/media/fonts/trackers."""
+        return cls(
+            headless=True,
+            page_load_strategy="eager",
+            block=RESOURCE_KINDS,
+            allow_list=allow_list,
+        )
+
+    @classmethod
+    def from_env(cls, default_headless: bool = False) -> "BrowserProfile":
+        """
+        Build a profile from environment variables.
+
+        LEAN_BROWSER=1 switches to the lean profile, BROWSER_HEADLESS overrides
+        headless mode and LEAN_BROWSER_ALLOW_LIST holds a JSON object such as
+        {"hotfrog.com": ["images"], "example.org": ["all"]}. RECORD_PAGES=1
+        captures network traffic for the page recorder.
+        """
+        allow_list = {}
+        raw_allow_list = os.environ.get("LEAN_BROWSER_ALLOW_LIST", "")
+        if raw_allow_list:
+            try:
+                allow_list = json.loads(raw_allow_list)
+            except ValueError:
+                logger.warning("Ignoring malformed LEAN_BROWSER_ALLOW_LIST")
+
+        if _env_flag("LEAN_BROWSER", False):
+            profile = cls.lean(allow_list=allow_list)
+        else:
+            profile = cls(headless=default_headless, allow_list=allow_list)
+
+        profile.headless = _env_flag("BROWSER_HEADLESS", profile.headless)
+        profile.capture_network = _env_flag("RECORD_PAGES", False)
+        return profile
+
+    def allowed_kinds(self, url: Optional[str] = None) -> Set[str]:
+        """Resource kinds the allow-list re-enables for the directory at `url`."""
+        if not url:
+            return set()
+        host = (urlparse(url).hostname or "").lower()
+        allowed = set()
+        for domain, kinds in self.allow_list.items():
+            if host == domain or host.endswith("." + domain):
+                allowed |= kinds
+        if "all" in allowed:
+            return set(RESOURCE_KINDS)
+        return allowed
+
+    def blocked_kinds(self, url: Optional[str] = None) -> Set[str]:
+        """Resource kinds that will actually be blocked for `url`."""
+        return self.block - self.allowed_kinds(url)
+
+    def blocked_url_patterns(self, url: Optional[str] = None) -> List[str]:
+        """CDP URL patterns to block for the directory at `url`."""
+        kinds = self.blocked_kinds(url)
+        patterns = []
+        for kind in ("images", "media", "fonts"):
+            if kind in kinds:
+                patterns.extend(RESOURCE_PATTERNS[kind])
+        if "third_party" in kinds:
+            host = (urlparse(url).hostname or "").lower() if url else ""
+            for domain in self.blocked_domains:
+                # Never block the directory itself, even if it is on the list
+                if host == domain or host.endswith("." + domain):
+                    continue
+                patterns.append(f"*{domain}*")
+        return patterns
+
+    def chrome_options(self, url: Optional[str] = None, shared: bool = False) -> webdriver.ChromeOptions:
+        """
+        Chrome options for a driver that will visit `url`.
+
+        A `shared` browser hosts many directories in tabs, so it skips the
+        browser-wide image pref and leaves blocking to the per-tab CDP rules.
+        """
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument("--headless=new")
+            options.add_argument("--window-size=1920,1080")
+        else:
+            options.add_argument("--start-maximized")
+        options.add_argument("--disable-extensions")
+        options.add_argument("--disable-popup-blocking")
+        options.add_argument("--disable-notifications")
+        options.add_argument(USER_AGENT)
+        options.page_load_strategy = self.page_load_strategy
+        if self.capture_network and not shared:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+        kinds = self.blocked_kinds(url)
+        prefs = {}
+        if "images" in kinds and not shared:
+            prefs["profile.managed_default_content_settings.images"] = 2
+        if "media" in kinds:
+            options.add_argument("--autoplay-policy=user-gesture-required")
+        if prefs:
+            options.add_experimental_option("prefs", prefs)
+        return options
+
+    def apply_network_rules(self, driver, url: Optional[str] = None):
+        """Install the CDP request blocking rules on a freshly created driver."""
+        patterns = self.blocked_url_patterns(url)
+        if not patterns:
+            return
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        except Exception as e:
+            # Non-Chromium drivers have no CDP; the prefs still apply
+            logger.debug(f"Could not install request blocking: {str(e)}")
+
+    def create_driver(self, url: Optional[str] = None):
+        """Start Chrome configured for `url` with blocking rules installed."""
+        driver = webdriver.Chrome(options=self.chrome_options(url))
+        self.apply_network_rules(driver, url)
+        return driver
+
+    def create_shared_driver(self):
+        """Start Chrome for hosting several directories as tabs."""
+        return webdriver.Chrome(options=self.chrome_options(shared=True))
@@ -0,0 +1,210 @@
+from helper.form_field import FIELD_SYNONYMS
+from typing import Dict, Iterable, List, Optional, Tuple
+import re
+
+# How much a synonym hit counts depending on where on the control it was found
+SOURCE_WEIGHTS = {
+    "label": 2.0,
+    "aria_label": 2.0,
+    "name": 1.5,
+    "id": 1.2,
+    "placeholder": 1.0,
+}
+
+# Synonyms that show up inside many unrelated field names count for less
+GENERIC_SYNONYMS = {"name", "title", "business", "url", "site", "contact", "about", "details", "tel"}
+GENERIC_WEIGHT = 0.6
+
+# Words that usually qualify another field ("company_email", "Business Phone");
+# they only count for their attribute when nothing else in the text matches
+QUALIFIER_SYNONYMS = {"company", "business", "organization", "organisation"}
+
+# Controls mentioning any of these are left alone: confirmation boxes, account
+# credentials, promo codes and optional second address lines
+NEGATIVE_PHRASES = [
+    "confirm", "confirmation", "verify", "repeat", "retype", "username", "login", "password",
+    "coupon", "promo", "captcha", "seo", "meta", "method", "line 2", "line2", "address2",
+]
+
+# HTML autocomplete tokens are standardized, so a hit there is decisive
+AUTOCOMPLETE_ATTRIBUTES = {
+    "organization": "company_name",
+    "url": "website_url",
+    "email": "email",
+    "tel": "phone",
+    "tel-national": "phone",
+    "street-address": "address",
+    "address-line1": "address",
+    "address-level2": "city",
+    "address-level1": "state",
+    "country": "country",
+    "country-name": "country",
+    "postal-code": "zip",
+    "name": "founder_name",
+    "given-name": "founder_name",
+    "family-name": "founder_name",
+}
+AUTOCOMPLETE_WEIGHT = 4.0
+
+# input type attributes that pin a control to one attribute
+INPUT_TYPE_ATTRIBUTES = {"email": "email", "url": "website_url", "tel": "phone"}
+INPUT_TYPE_WEIGHT = 1.5
+
+# Below this a control is left alone rather than filled with a guess
+MIN_SCORE = 0.75
+
+# Describes every fillable, visible text control on the page in one round trip
+COLLECT_CONTROLS_JS = """
+var skip = ['hidden', 'submit', 'button', 'checkbox', 'radio', 'password', 'file', 'image', 'reset', 'search'];
+var controls = [];
+var elements = document.querySelectorAll('input, textarea');
+for (var i = 0; i < elements.length; i++) {
+    var el = elements[i];
+    var tag = el.tagName.toLowerCase();
+    var type = (el.getAttribute('type') || (tag === 'textarea' ? 'textarea' : 'text')).toLowerCase();
+    if (skip.indexOf(type) !== -1 || el.disabled || el.readOnly) { continue; }
+    // Invisible fields are usually honeypots
+    if (!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)) { continue; }
+    var label = '';
+    if (el.labels && el.labels.length) {
+        label = el.labels[0].innerText;
+    } else if (el.getAttribute('aria-labelledby')) {
+        var ref = document.getElementById(el.getAttribute('aria-labelledby'));
+        if (ref) { label = ref.innerText; }
+    } else if (el.previousElementSibling && el.previousElementSibling.tagName === 'LABEL') {
+        label = el.previousElementSibling.innerText;
+    }
+    controls.push({
+        element: el,
+        tag: tag,
+        type: type,
+        name: el.getAttribute('name') || '',
+        id: el.id || '',
+        placeholder: el.getAttribute('placeholder') || '',
+        aria_label: el.getAttribute('aria-label') || '',
+        autocomplete: el.getAttribute('autocomplete') || '',
+        label: (label || '').trim()
+    });
+}
+return controls;
+"""
+
+_CAMEL_CASE = re.compile(r"([a-z0-9])([A-Z])")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def tokenize(text: Optional[str]) -> Tuple[str, ...]:
+    """Lowercase word tokens of an attribute value: "bizWebsite_URL" -> ("biz", "website", "url")."""
+    if not text:
+        return ()
+    text = _CAMEL_CASE.sub(r"\1 \2", text).lower().replace("e-mail", "email")
+    return tuple(token for token in _NON_ALNUM.split(text) if token)
+
+
+def _contains(haystack: Tuple[str, ...], needle: Tuple[str, ...]) -> bool:
+    size = len(needle)
+    return any(haystack[i:i + size] == needle for i in range(len(haystack) - size + 1))
+
+
+class FieldMatcher:
+    def __init__(self, synonyms: Dict[str, List[str]] = None):
+        """
+        Precompiled index from field-name tokens to business attributes.
+
+        Built once from the form_field synonyms; matching a form is then a
+        lookup per token instead of one XPath query per synonym.
+        """
+        synonyms = synonyms or FIELD_SYNONYMS
+        self.attributes = list(synonyms)
+        self.negative = [tokenize(phrase) for phrase in NEGATIVE_PHRASES]
+        self.qualifiers = {tokenize(word) for word in QUALIFIER_SYNONYMS}
+        # first token -> [(synonym tokens, attribute, weight)]
+        self.index: Dict[str, List[Tuple[Tuple[str, ...], str, float]]] = {}
+        for attribute, words in synonyms.items():
+            for word in words:
+                tokens = tokenize(word)
+                if not tokens:
+                    continue
+                weight = GENERIC_WEIGHT if word in GENERIC_SYNONYMS else 1.0
+                self.index.setdefault(tokens[0], []).append((tokens, attribute, weight))
+
+    def _score_text(self, tokens: Tuple[str, ...], scores: Dict[str, float], source_weight: float):
+        """Add the best synonym hit per attribute found in `tokens`."""
+        hits = []
+        # Attributes hit by more than a qualifier word
+        qualified = set()
+        for token in set(tokens):
+            for synonym, attribute, weight in self.index.get(token, ()):
+                if _contains(tokens, synonym):
+                    hits.append((synonym, attribute, weight))
+                    if synonym not in self.qualifiers:
+                        qualified.add(attribute)
+
+        size = len(tokens)
+        if qualified:
+            # "company_email" is an email field: drop the qualifier's own hit
+            # and do not let the qualifier dilute the real synonym's coverage
+            hits = [hit for hit in hits if hit[1] in qualified]
+            size = max(1, sum(1 for token in tokens if (token,) not in self.qualifiers))
+
+        best: Dict[str, float] = {}
+        for synonym, attribute, weight in hits:
+            # Synonyms covering more of the field text are more specific
+            strength = weight * (0.5 + 0.5 * min(1.0, len(synonym) / size))
+            if strength > best.get(attribute, 0):
+                best[attribute] = strength
+        for attribute, strength in best.items():
+            scores[attribute] = scores.get(attribute, 0) + source_weight * strength
+
+    def score(self, control: Dict[str, str]) -> Dict[str, float]:
+        """Score of every business attribute for one form control descriptor."""
+        texts = {source: tokenize(control.get(source)) for source in SOURCE_WEIGHTS}
+        if any(_contains(tokens, phrase) for tokens in texts.values() for phrase in self.negative):
+            return {}
+
+        scores: Dict[str, float] = {}
+        for source, source_weight in SOURCE_WEIGHTS.items():
+            if texts[source]:
+                self._score_text(texts[source], scores, source_weight)
+
+        autocomplete = (control.get("autocomplete") or "").lower().split()
+        for token in autocomplete:
+            attribute = AUTOCOMPLETE_ATTRIBUTES.get(token)
+            if attribute:
+                scores[attribute] = scores.get(attribute, 0) + AUTOCOMPLETE_WEIGHT
+
+        attribute = INPUT_TYPE_ATTRIBUTES.get((control.get("type") or "").lower())
+        if attribute:
+            scores[attribute] = scores.get(attribute, 0) + INPUT_TYPE_WEIGHT
+        return scores
+
+    def match(self, controls: Iterable[Dict[str, str]],
+              attributes: Optional[Iterable[str]] = None) -> List[Tuple[int, str, float]]:
+        """
+        Assign each control to its single best-scoring business attribute.
+
+        `attributes` lists the attributes that have a value to write; a control
+        whose best attribute has none is left empty rather than given its
+        runner-up. Returns (control index, attribute, score) for every control
+        that cleared MIN_SCORE; each control appears at most once.
+        """
+        allowed = set(attributes) if attributes is not None else None
+        assignments = []
+        for position, control in enumerate(controls):
+            scores = self.score(control)
+            if not scores:
+                continue
+            attribute = max(scores, key=lambda a: (scores[a], -self.attributes.index(a)))
+            if scores[attribute] < MIN_SCORE or (allowed is not None and attribute not in allowed):
+                continue
+            assignments.append((position, attribute, round(scores[attribute], 3)))
+        return assignments
+
+
+# Shared, built once per process
+field_matcher = FieldMatcher()
+
+
+def collect_controls(driver) -> List[Dict]:
+    """Descriptors of the page's text controls; each carries its WebElement under "element"."""
+    return driver.execute_script(COLLECT_CONTROLS_JS) or []
@@ -1,38 +1,74 @@
+# Form field synonyms per business attribute, in the order they are tried
+FIELD_SYNONYMS = {
+    "company_name": ["name", "title", "company", "business", "company name", "business name", "organization", "organisation"],
+    "website_url": ["url", "website", "site", "homepage", "web address", "website url"],
+    "email": ["email", "e-mail", "email address"],
+    "phone": ["phone", "contact", "telephone", "tel", "mobile", "phone number"],
+    "business_description": ["description", "about", "summary", "details", "describe", "tell us about"],
+    "business_category": ["category"],
+    "keywords": ["keywords", "tags"],
+    "address": ["address", "street", "street address", "address line"],
+    "city": ["city", "town", "town/city", "city/town", "locality"],
+    "state": ["state", "province", "region", "county"],
+    "country": ["country", "nation"],
+    "zip": ["zip", "postal", "postcode", "zipcode", "zip code", "postal code"],
+    "facebook": ["facebook"],
+    "twitter": ["twitter"],
+    "linkedin": ["linkedin", "linked in"],
+    "instagram": ["instagram"],
+    "founder_name": ["founder", "owner", "contact name", "your name", "full name", "first name", "last name", "person"],
+}
+
+# Synonyms from the original flat mapping; form_field() keeps exactly these keys
+LEGACY_SYNONYMS = {
+    "company_name": ["name", "title", "company", "business"],
+    "website_url": ["url", "website", "site"],
+    "email": ["email"],
+    "phone": ["phone", "contact"],
+    "business_description": ["description", "about"],
+    "business_category": ["category"],
+    "keywords": ["keywords", "tags"],
+    "address": ["address"],
+    "city": ["city", "town", "town/city", "city/town"],
+    "state": ["state", "province", "region"],
+    "country": ["country", "nation"],
+    "zip": ["zip", "postal", "postcode", "zipcode"],
+    "facebook": ["facebook"],
+    "twitter": ["twitter"],
+    "linkedin": ["linkedin"],
+    "instagram": ["instagram"],
+    "founder_name": ["founder", "owner"],
+}
+
+
+def field_values(data):
+    """Value of every business attribute that can go into a form."""
+    return {
+        "company_name": data["company_name"],
+        "website_url": data["website_url"],
+        "email": data["email"],
+        "phone": data["phone"],
+        "business_description": data["business_description"],
+        "business_category": data["business_category"],
+        "keywords": ", ".join(data["keywords"]),
+        "address": data["address"],
+        "city": data["location"].get("city", ""),
+        "state": data["location"].get("state", ""),
+        "country": data["location"].get("country", ""),
+        "zip": data["location"].get("zip", ""),
+        "facebook": data["social_media_links"].get("facebook", ""),
+        "twitter": data["social_media_links"].get("twitter", ""),
+        "linkedin": data["social_media_links"].get("linkedin", ""),
+        "instagram": data["social_media_links"].get("instagram", ""),
+        "founder_name": data["founder_name"],
+    }
+
+
 def form_field(data):
+    """Flat synonym -> value mapping used for substring matching."""
+    values = field_values(data)
     return {
-            "name": data["company_name"],
-            "title": data["company_name"],
-            "company": data["company_name"],
-            "business": data["company_name"],
-            "url": data["website_url"],
-            "website": data["website_url"],
-            "site": data["website_url"],
-            "email": data["email"],
-            "phone": data["phone"],
-            "contact": data["phone"],
-            "description": data["business_description"],
-            "about": data["business_description"],
-            "category": data["business_category"],
-            "keywords": ", ".join(data["keywords"]),
-            "tags": ", ".join(data["keywords"]),
-            "address": data["address"],
-            "city": data["location"].get("city", ""),
-            "town": data["location"].get("city", ""),
-            "town/city": data["location"].get("city", ""),
-            "city/town": data["location"].get("city", ""),
-            "state": data["location"].get("state", ""),
-            "province": data["location"].get("state", ""),
-            "region": data["location"].get("state", ""),
-            "country": data["location"].get("country", ""),
-            "nation": data["location"].get("country", ""),
-            "zip": data["location"].get("zip", ""),
-            "postal": data["location"].get("zip", ""),
-            "postcode": data["location"].get("zip", ""),
-            "zipcode": data["location"].get("zip", ""),
-            "facebook": data["social_media_links"].get("facebook", ""),
-            "twitter": data["social_media_links"].get("twitter", ""),
-            "linkedin": data["social_media_links"].get("linkedin", ""),
-            "instagram": data["social_media_links"].get("instagram", ""),
-            "founder": data["founder_name"],
-            "owner": data["founder_name"],
-        }
\ No newline at end of file
+        synonym: values[attribute]
+        for attribute, synonyms in LEGACY_SYNONYMS.items()
+        for synonym in synonyms
+    }
@@ -0,0 +1,169 @@
+from bs4 import BeautifulSoup
+from typing import Dict, Optional
+from urllib.parse import quote_plus, urlencode, urljoin, urlparse
+import re
+
+# Most specific phrases first so "add listing" wins over a bare "add"
+SUBMISSION_LINK_TEXTS = [
+    "submit your site", "add your site", "submit business", "add business",
+    "add listing", "submit listing", "submit", "add", "list"
+]
+
+SUBMISSION_LINK_HREFS = ["submit", "add-listing", "add-business", "addlisting", "add_listing"]
+
+LOGIN_INDICATORS = [
+    "login", "sign in", "log in", "signin", "log-in",
+    "register", "sign up", "signup", "create account"
+]
+
+OPENSEARCH_TYPE = "application/opensearchdescription+xml"
+
+SUCCESS_INDICATORS = [
+    "success", "thank", "thanks", "confirm", "confirmation",
+    "submitted", "complete", "completed"
+]
+
+ERROR_INDICATORS = ["error", "failed", "invalid", "wrong"]
+
+
+def find_submission_link(soup: BeautifulSoup, base_url: str) -> Optional[str]:
+    """Absolute URL of the "submit/add listing" page linked from `soup`, if any."""
+    anchors = [a for a in soup.find_all("a", href=True) if not a["href"].startswith(("#", "javascript:", "mailto:"))]
+
+    for text in SUBMISSION_LINK_TEXTS:
+        for anchor in anchors:
+            if text in anchor.get_text(" ", strip=True).lower():
+                return urljoin(base_url, anchor["href"])
+
+    for fragment in SUBMISSION_LINK_HREFS:
+        for anchor in anchors:
+            if fragment in anchor["href"].lower():
+                return urljoin(base_url, anchor["href"])
+
+    return None
+
+
+def is_login_required(soup: BeautifulSoup) -> bool:
+    """A login/registration form (one with a password field) is on the page."""
+    page_text = soup.get_text(" ").lower()
+    if not any(indicator in page_text for indicator in LOGIN_INDICATORS):
+        return False
+    for form in soup.find_all("form"):
+        if form.find("input", attrs={"type": "password"}):
+            return True
+    return False
+
+
+def _is_search_input(tag) -> bool:
+    if tag.name != "input":
+        return False
+    input_type = (tag.get("type") or "text").lower()
+    name = (tag.get("name") or "").lower()
+    placeholder = (tag.get("placeholder") or "").lower()
+    return input_type == "search" or "search" in name or "search" in placeholder or name in ("q", "query", "keyword", "keywords")
+
+
+def find_search_form(soup: BeautifulSoup, base_url: str) -> Optional[Dict[str, str]]:
+    """
+    Locate the site search form.
+
+    Returns the form action, HTTP method and, for GET forms, an OpenSearch-style
+    URL template with a {searchTerms} placeholder that a browser can open directly.
+    """
+    for form in soup.find_all("form"):
+        search_input = form.find(_is_search_input)
+        if not search_input or not search_input.get("name"):
+            continue
+
+        action = urljoin(base_url, form.get("action") or base_url)
+        method = (form.get("method") or "get").lower()
+        result = {"action": action, "method": method, "template": None}
+
+        if method == "get":
+            params = {}
+            for hidden in form.find_all("input", attrs={"type": "hidden"}):
+                if hidden.get("name"):
+                    params[hidden["name"]] = hidden.get("value", "")
+            query = urlencode(params)
+            query = f"{query}&" if query else ""
+            separator = "&" if "?" in action else "?"
+            result["template"] = f"{action}{separator}{query}{search_input['name']}={{searchTerms}}"
+        return result
+
+    return None
+
+
+def find_opensearch_descriptor(soup: BeautifulSoup, base_url: str) -> Optional[str]:
+    """Absolute URL of the page's OpenSearch description document, if advertised."""
+    for link in soup.find_all("link", href=True):
+        if (link.get("type") or "").lower() == OPENSEARCH_TYPE:
+            return urljoin(base_url, link["href"])
+    return None
+
+
+def parse_opensearch_template(xml: str) -> Optional[str]:
+    """HTML search URL template from an OpenSearch description document."""
+    soup = BeautifulSoup(xml, "html.parser")
+    for url in soup.find_all("url"):
+        if (url.get("type") or "").lower() == "text/html" and url.get("template"):
+            return url["template"]
+    return None
+
+
+def fill_search_template(template: str, terms: str) -> str:
+    """Substitute the search terms into an OpenSearch URL template, dropping other parameters."""
+    url = template.replace("{searchTerms}", quote_plus(terms))
+    return re.sub(r"\{[^}]*\}", "", url)
+
+
+def is_submission_successful(url: str, html: str) -> bool:
+    """Whether the page shown after posting a directory form confirms the submission."""
+    page_text = html.lower()
+
+    # Check URL for success indicators
+    for indicator in SUCCESS_INDICATORS:
+        if indicator in url.lower():
+            return True
+
+    # Check page content for success messages
+    for indicator in SUCCESS_INDICATORS:
+        if indicator in page_text:
+            patterns = [
+                f".*{indicator}.*submission.*",
+                f".*submission.*{indicator}.*",
+                f".*{indicator}.*received.*",
+                f".*{indicator}.*added.*",
+                f".*successfully.*{indicator}.*"
+            ]
+
+            for pattern in patterns:
+                if re.search(pattern, page_text):
+                    return True
+
+    # Check for error indicators
+    for indicator in ERROR_INDICATORS:
+        if indicator in page_text:
+            return False
+
+    # Default to True if no clear error indicators
+    return True
+
+
+def classify_listing(html: str, company_name: str, website_url: str) -> str:
+    """Listing status shown by a directory search page: live, potential or not_found."""
+    page_content = html.lower()
+    if company_name.lower() not in page_content:
+        return "not_found"
+
+    # Check for website URL for higher confidence
+    if website_url.lower() in page_content:
+        return "live"
+
+    # Check for links containing the domain
+    domain = urlparse(website_url).netloc
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.find("a", href=lambda href: href and domain in href):
+        return "live"
+
+    # Only name found
+    return "potential"
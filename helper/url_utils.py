@@ -0,0 +1,63 @@
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {"gclid", "dclid", "fbclid", "msclkid", "yclid", "mc_cid", "mc_eid", "_ga", "ref", "referrer"}
+
+
+def directory_domain(url: str) -> str:
+    """Lowercased host of a directory URL without a leading 'www.', used as a per-directory key."""
+    if "://" not in url:
+        url = f"http://{url}"
+    host = (urlparse(url).netloc or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+def is_valid_url(url: str) -> bool:
+    """The URL parses, has a host and, if it names a port, a numeric one."""
+    if "://" not in url:
+        url = f"http://{url}"
+    try:
+        parsed = urlparse(url.strip())
+        parsed.port
+    except ValueError:
+        return False
+    return bool(parsed.hostname)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Canonical form of a directory URL, used to spot the same directory across uploads.
+
+    http/https and a leading 'www.' are ignored, as are default ports, trailing
+    slashes, fragments, utm_* and other tracking parameters; the remaining
+    query parameters are sorted. Only meant as a key, not for navigation.
+    Malformed URLs (see is_valid_url) never raise: an unparseable one is
+    its own key and a bad port is kept as written.
+    """
+    url = url.strip()
+    if "://" not in url:
+        url = f"http://{url}"
+    try:
+        parsed = urlparse(url)
+    except ValueError:
+        return url
+
+    try:
+        port = parsed.port
+        host = (parsed.hostname or "").lower()
+    except ValueError:
+        port = None
+        host = parsed.netloc.rsplit("@", 1)[-1].lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    return urlunparse(("https", host, parsed.path.rstrip("/"), "", urlencode(query), ""))
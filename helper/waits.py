@@ -0,0 +1,300 @@
+from selenium.common.exceptions import StaleElementReferenceException
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Counts in-flight fetch/XHR requests so network idleness can be observed from JS
+NETWORK_TRACKER_JS = """
+(function() {
+    if (window.__seoAgentPending !== undefined) { return; }
+    window.__seoAgentPending = 0;
+    var done = function() { window.__seoAgentPending = Math.max(0, window.__seoAgentPending - 1); };
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function() {
+            window.__seoAgentPending++;
+            return originalFetch.apply(this, arguments).finally(done);
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function() {
+        window.__seoAgentPending++;
+        this.addEventListener('loadend', done);
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+PAGE_STATE_JS = """
+return [document.readyState,
+        window.__seoAgentPending || 0,
+        performance.getEntriesByType('resource').length];
+"""
+
+# Upper bounds in seconds; waits return as soon as their condition holds
+DEFAULT_TIMEOUTS = {
+    "navigate": 20,
+    "submission_page": 15,
+    "form": 10,
+    "login": 15,
+    "submit": 20,
+    "search": 15,
+    "captcha": 120,
+}
+
+MIN_TIMEOUT = 5
+
+# Adapted timeouts are this many times the domain's average wait
+TIMEOUT_MULTIPLIER = 3
+
+# Each real timeout makes the domain's next timeout this much longer
+TIMEOUT_GROWTH = 1.25
+
+# Seconds a wait leaves before the watchdog's stage deadline for the rest of the stage
+DEADLINE_MARGIN = 5
+
+
+class WaitCondition:
+    def __init__(self, name: str, check: Callable, soft: Optional[Callable] = None):
+        """
+        A named, non-blocking check against the current page.
+
+        `soft` is a weaker check that still counts as a pass when the wait
+        times out, for conditions some pages never meet.
+        """
+        self.name = name
+        self.check = check
+        self.soft = soft
+
+    def __call__(self, driver) -> bool:
+        try:
+            return bool(self.check(driver))
+        except Exception:
+            # Pages mid-navigation throw all sorts of driver errors; keep polling
+            return False
+
+    def soft_pass(self, driver) -> bool:
+        if self.soft is None:
+            return False
+        try:
+            return bool(self.soft(driver))
+        except Exception:
+            return False
+
+
+def document_ready(states=("complete",)) -> WaitCondition:
+    """document.readyState reached one of `states`."""
+    return WaitCondition(
+        "document_ready",
+        lambda driver: driver.execute_script("return document.readyState") in states
+    )
+
+
+def _loaded_without_requests(driver) -> bool:
+    ready_state, pending, _ = driver.execute_script(PAGE_STATE_JS)
+    return ready_state == "complete" and not pending
+
+
+def network_idle(quiet_seconds: float = 0.5, max_settle: float = 3.0) -> WaitCondition:
+    """
+    No fetch/XHR in flight and no new resources loaded for `quiet_seconds`.
+
+    Analytics beacons and lazy loading keep adding resources on some pages
+    forever; once the document has been complete for `max_settle` seconds,
+    having no fetch/XHR in flight is enough.
+    """
+    state = {"count": None, "since": None, "complete_since": None}
+
+    def check(driver):
+        ready_state, pending, resources = driver.execute_script(PAGE_STATE_JS)
+        now = time.monotonic()
+        if ready_state == "complete" and state["complete_since"] is None:
+            state["complete_since"] = now
+        if ready_state == "loading" or pending:
+            state["count"], state["since"] = None, None
+            return False
+        if state["complete_since"] is not None and now - state["complete_since"] >= max_settle:
+            return True
+        if resources != state["count"]:
+            state["count"], state["since"] = resources, now
+            return False
+        return now - state["since"] >= quiet_seconds
+
+    return WaitCondition("network_idle", check, soft=_loaded_without_requests)
+
+
+def url_changes(from_url: str) -> WaitCondition:
+    """The browser navigated away from `from_url`."""
+    return WaitCondition("url_changes", lambda driver: driver.current_url != from_url)
+
+
+def element_present(by: str, locator: str) -> WaitCondition:
+    """At least one element matches the locator."""
+    return WaitCondition(
+        f"element_present({locator})",
+        lambda driver: len(driver.find_elements(by, locator)) > 0
+    )
+
+
+def element_stale(element) -> WaitCondition:
+    """The element was detached from the DOM, e.g. by a form post or re-render."""
+    def check(driver):
+        try:
+            element.is_enabled()
+            return False
+        except StaleElementReferenceException:
+            return True
+
+    return WaitCondition("element_stale", check)
+
+
+def any_of(*conditions: WaitCondition) -> WaitCondition:
+    """Any of the given conditions holds."""
+    return WaitCondition(
+        " | ".join(c.name for c in conditions),
+        lambda driver: any(c(driver) for c in conditions),
+        soft=lambda driver: any(c.soft_pass(driver) for c in conditions)
+    )
+
+
+class LatencyTracker:
+    def __init__(self, alpha: float = 0.3):
+        """Exponentially weighted average of how long each domain takes per step."""
+        self.alpha = alpha
+        self._averages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, domain: str, step: str, seconds: float):
+        """Fold one observed wait into the domain's average."""
+        key = (domain, step)
+        with self._lock:
+            previous = self._averages.get(key)
+            if previous is None:
+                self._averages[key] = seconds
+            else:
+                self._averages[key] = self.alpha * seconds + (1 - self.alpha) * previous
+
+    def grow(self, domain: str, step: str, timeout: float):
+        """After a timeout, raise the average so the next timeout is TIMEOUT_GROWTH times `timeout`."""
+        key = (domain, step)
+        with self._lock:
+            self._averages[key] = max(self._averages.get(key) or 0, timeout / TIMEOUT_MULTIPLIER) * TIMEOUT_GROWTH
+
+    def average(self, domain: str, step: str) -> Optional[float]:
+        """Average wait for the step on the domain, or None if never observed."""
+        with self._lock:
+            return self._averages.get((domain, step))
+
+
+# Shared by every agent in the process so each domain is learned once
+latency_tracker = LatencyTracker()
+
+
+class PageWaiter:
+    def __init__(self, driver, url: str, timeouts: Optional[Dict[str, float]] = None,
+                 tracker: Optional[LatencyTracker] = None, poll_interval: float = 0.1, watched=None):
+        """
+        Wait on page readiness for one driver, adapting timeouts to the domain.
+
+        With the driver's WatchedBrowser, every wait ends DEADLINE_MARGIN
+        seconds before the current stage deadline, so a slow but working
+        page is never killed by the watchdog for waiting too long.
+        """
+        self.driver = driver
+        self.watched = watched
+        self.domain = urlparse(url).netloc.lower()
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.tracker = tracker or latency_tracker
+        self.poll_interval = poll_interval
+        self.timings: List[Dict] = []
+        self._install_network_tracker()
+
+    def _install_network_tracker(self):
+        """Make the fetch/XHR counter run before any page script."""
+        try:
+            self.driver.execute_cdp_cmd(
+                "Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_JS}
+            )
+        except Exception as e:
+            logger.debug(f"Network tracker unavailable, relying on resource timing: {str(e)}")
+
+    def timeout_for(self, step: str) -> float:
+        """
+        Timeout for a step on this domain.
+
+        Unseen domains get the step default. Once a domain has history the
+        timeout follows three times its average, so fast sites fail fast and
+        slow sites are not cut off, capped at three times the default.
+        """
+        default = self.timeouts.get(step, DEFAULT_TIMEOUTS["navigate"])
+        average = self.tracker.average(self.domain, step)
+        if average is None:
+            return default
+        return min(TIMEOUT_MULTIPLIER * default, max(MIN_TIMEOUT, TIMEOUT_MULTIPLIER * average))
+
+    def wait(self, step: str, *conditions: WaitCondition, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every condition holds or the step times out.
+
+        Returns False on timeout instead of raising so a slow page degrades
+        like the old fixed sleeps did. A timeout where every unmet condition
+        still passes its soft check (e.g. a loaded page that keeps polling)
+        counts as success. Waits that finish feed the domain's average; a
+        real timeout grows the domain's next timeout by TIMEOUT_GROWTH,
+        unless the wait was cut short by the stage deadline.
+        """
+        timeout = timeout if timeout is not None else self.timeout_for(step)
+        start = time.monotonic()
+        capped = False
+        if self.watched is not None and self.watched.deadline:
+            left = max(0.0, self.watched.deadline - start - DEADLINE_MARGIN)
+            capped = left < timeout
+            timeout = min(timeout, left)
+        deadline = start + timeout
+        pending = list(conditions)
+
+        while True:
+            pending = [c for c in pending if not c(self.driver)]
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+
+        elapsed = time.monotonic() - start
+        soft = bool(pending) and all(c.soft_pass(self.driver) for c in pending)
+        timed_out = bool(pending) and not soft
+        self.timings.append({
+            "step": step,
+            "seconds": round(elapsed, 3),
+            "timeout": round(timeout, 3),
+            "timed_out": timed_out,
+            "soft": soft,
+            "capped": capped,
+        })
+        if timed_out:
+            logger.info(f"Timed out after {elapsed:.1f}s waiting for {step} on {self.domain}: "
+                        f"{', '.join(c.name for c in pending)}")
+            # A wait cut short by the stage deadline says nothing about the domain
+            if not capped:
+                self.tracker.grow(self.domain, step, timeout)
+        elif not soft:
+            self.tracker.observe(self.domain, step, elapsed)
+        return not timed_out
+
+    def wait_for_page(self, step: str) -> bool:
+        """Wait until the document is loaded and the network has gone quiet."""
+        return self.wait(step, document_ready(("interactive", "complete")), network_idle())
+
+    def wait_for_navigation(self, step: str, from_url: str, element=None) -> bool:
+        """Wait for an action to move the page on, then for the new page to settle."""
+        # An in-page (AJAX) update neither navigates nor detaches the element,
+        # so a quiet network after the action also counts as having moved on
+        changed = [url_changes(from_url), network_idle(quiet_seconds=2.0)]
+        if element is not None:
+            changed.append(element_stale(element))
+        self.wait(step, any_of(*changed))
+        return self.wait_for_page(f"{step}_settle")
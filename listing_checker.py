@@ -1,144 +1,174 @@
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from helper.browser_profile import BrowserProfile
+from helper.waits import PageWaiter
+from helper.page_analysis import classify_listing, fill_search_template
+from helper.url_utils import directory_domain
 import logging
-import time
-import json
-import re
-from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional
 from urllib.parse import urlparse, quote
 
 logger = logging.getLogger(__name__)
 
 class ListingChecker:
-    def __init__(self, data_manager):
-        """Initialize with a DataManager instance."""
+    def __init__(self, data_manager, browser_profile: Optional[BrowserProfile] = None, session_store=None,
+                 tab_pool=None, watchdog=None, recorder=None):
+        """
+        Initialize with a DataManager instance.
+
+        An optional SessionStore reuses directory logins, an optional TabPool
+        checks several directories at once as tabs of one browser and an
+        optional BrowserWatchdog kills checks that hang. An optional
+        PageRecorder archives each result page for offline replay.
+        """
         self.data_manager = data_manager
-        # Configure Chrome options for Selenium
-        self.chrome_options = webdriver.ChromeOptions()
-        self.chrome_options.add_argument("--start-maximized")
-        self.chrome_options.add_argument("--disable-extensions")
-        self.chrome_options.add_argument("--disable-popup-blocking")
-        self.chrome_options.add_argument("--disable-notifications")
-        self.chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.110 Safari/537.36")
-        # For headless mode (uncomment if needed)
-        self.chrome_options.add_argument("--headless")
-        # self.chrome_options.add_argument("--disable-gpu")
+        self.session_store = session_store
+        self.tab_pool = tab_pool
+        self.watchdog = watchdog
+        self.recorder = recorder
+        # Listing checks never need a visible window
+        self.browser_profile = browser_profile or BrowserProfile.from_env(default_headless=True)
     
     def check_listings_for_business(self, business_id: int):
         """Check listing status for all successful submissions of a business."""
-        submissions = self.data_manager.get_submissions_for_checking(business_id)
-        
-        for submission in submissions:
-            try:
-                business_data = json.loads(submission["data"])
-                company_name = business_data["company_name"]
-                
-                listing_status = self._check_listing(
-                    directory_url=submission["directory_url"],
-                    company_name=company_name,
-                    website_url=business_data["website_url"]
-                )
-                
-                # Update status in database
-                self.data_manager.update_listing_status(
-                    business_id=submission["business_id"],
-                    directory_url=submission["directory_url"],
-                    listing_status=listing_status
+        self._check_submissions(self.data_manager.iter_submissions_for_checking(business_id))
+    
+    def _check_submissions(self, submissions: Iterable[Dict]):
+        """Check a stream of submissions without holding more than a few in memory."""
+        if self.tab_pool:
+            self.tab_pool.map(self._check_submission, submissions)
+        else:
+            for submission in submissions:
+                self._check_submission(submission)
+    
+    def _check_submission(self, submission: Dict):
+        """Check one submission's listing and store the result."""
+        try:
+            listing_status = self._check_listing(
+                directory_url=submission["directory_url"],
+                company_name=submission["company_name"],
+                website_url=submission["website_url"],
+                business_id=submission["business_id"],
+                directory_profile=self.data_manager.get_directory_profile(
+                    directory_domain(submission["directory_url"])
                 )
-                
-                logger.info(f"Updated listing status for {submission['directory_url']}: {listing_status}")
-                
-            except Exception as e:
-                logger.error(f"Error checking listing for {submission['directory_url']}: {str(e)}")
+            )
+            
+            # Update status in database
+            self.data_manager.update_listing_status(
+                business_id=submission["business_id"],
+                directory_url=submission["directory_url"],
+                listing_status=listing_status
+            )
+            
+            logger.info(f"Updated listing status for {submission['directory_url']}: {listing_status}")
+            
+        except Exception as e:
+            logger.error(f"Error checking listing for {submission['directory_url']}: {str(e)}")
     
-    def _check_listing(self, directory_url: str, company_name: str, website_url: str) -> str:
+    def _check_listing(self, directory_url: str, company_name: str, website_url: str,
+                       business_id: Optional[int] = None, directory_profile: Optional[Dict] = None) -> str:
         """Check if a business listing is live on a directory."""
         driver = None
+        waiter = None
+        watched = None
+        recording = None
+        if self.recorder:
+            recording = self.recorder.start("listing", directory_url, business_id=business_id,
+                                            company_name=company_name, website_url=website_url)
         try:
-            # Initialize Chrome driver
-            driver = webdriver.Chrome(options=self.chrome_options)
-            wait = WebDriverWait(driver, 20)
+            # Initialize Chrome driver for this directory
+            driver = (self.tab_pool or self.browser_profile).create_driver(directory_url)
+            if self.watchdog:
+                watched = self.watchdog.watch(driver, business_id=business_id, directory_url=directory_url,
+                                              check_memory=self.tab_pool is None)
+                watched.enter("listing_check")
+            waiter = PageWaiter(driver, directory_url, watched=watched)
             
-            # Navigate to directory homepage
-            driver.get(directory_url)
-            time.sleep(2)
+            # Reuse the submission login so members-only listings are visible
+            # and repeated anonymous visits do not trip bot defenses
+            if self.session_store and business_id is not None:
+                self.session_store.restore(driver, business_id, directory_url)
             
-            # Look for search box
-            search_boxes = driver.find_elements(By.XPATH, "//input[@type='search' or contains(@name, 'search') or contains(@placeholder, 'search')]")
+            search_template = directory_profile.get("search_url_template") if directory_profile else None
             
-            if search_boxes:
-                # Use search box to find listing
-                search_box = search_boxes[0]
-                search_box.clear()
-                search_box.send_keys(company_name)
-                search_box.submit()
-                time.sleep(3)
+            if search_template:
+                # Pre-crawled search endpoint, skip the homepage entirely
+                driver.get(fill_search_template(search_template, company_name))
+                waiter.wait_for_page("search")
             else:
-                # Try to construct a search URL
-                parsed_url = urlparse(directory_url)
-                base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-                search_paths = ["/search", "/directory", "/listings", "/find"]
+                # Navigate to directory homepage
+                driver.get(directory_url)
+                waiter.wait_for_page("navigate")
+                
+                # Look for search box
+                search_boxes = driver.find_elements(By.XPATH, "//input[@type='search' or contains(@name, 'search') or contains(@placeholder, 'search')]")
                 
-                for path in search_paths:
-                    try:
-                        search_url = f"{base_url}{path}?q={quote(company_name)}"
-                        driver.get(search_url)
-                        time.sleep(2)
-                        page_content = driver.page_source.lower()
-                        if company_name.lower() in page_content:
-                            break
-                    except Exception:
-                        continue
+                if search_boxes:
+                    # Use search box to find listing
+                    search_box = search_boxes[0]
+                    search_box.clear()
+                    search_box.send_keys(company_name)
+                    current_url = driver.current_url
+                    search_box.submit()
+                    waiter.wait_for_navigation("search", current_url, search_box)
+                else:
+                    # Try to construct a search URL
+                    parsed_url = urlparse(directory_url)
+                    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+                    search_paths = ["/search", "/directory", "/listings", "/find"]
+                    
+                    for path in search_paths:
+                        # Each guess loads a page of its own, so each gets a full deadline
+                        if watched:
+                            watched.enter("listing_check", check_memory=False)
+                        try:
+                            search_url = f"{base_url}{path}?q={quote(company_name)}"
+                            driver.get(search_url)
+                            waiter.wait_for_page("search")
+                            page_content = driver.page_source.lower()
+                            if company_name.lower() in page_content:
+                                break
+                        except Exception:
+                            continue
             
             # Check if company name or website appears on the page
-            page_content = driver.page_source.lower()
-            company_name_lower = company_name.lower()
-            website_url_lower = website_url.lower()
-            
-            if company_name_lower in page_content:
-                # Check for website URL for higher confidence
-                if website_url_lower in page_content:
-                    return "live"
-                
-                # Check for links containing the domain
-                domain = urlparse(website_url).netloc
-                links = driver.find_elements(By.XPATH, f"//a[contains(@href, '{domain}')]")
-                
-                if links:
-                    return "live"
-                
-                # Only name found
-                return "potential"
-            else:  
-                return "not_found"
+            listing_status = classify_listing(driver.page_source, company_name, website_url)
+            if recording:
+                recording.snapshot(driver, "result", controls=[])
+                recording.record(listing_status=listing_status)
+            return listing_status
             
         except Exception as e:
             logger.error(f"Error during listing check for {directory_url}: {str(e)}")
+            if recording:
+                recording.record(listing_status="error")
             return "error"
         
         finally:
+            if recording:
+                recording.save(driver)
+            if waiter:
+                logger.debug(f"Wait timings for {directory_url}: {waiter.timings}")
             if driver:
-                driver.quit()
+                try:
+                    driver.quit()
+                except Exception as e:
+                    logger.debug(f"Error quitting driver: {str(e)}")
+            if watched:
+                watched.close()
     
     def check_all_listings(self):
         """Check all listings that need verification (weekly task)."""
         logger.info("Running weekly listing check for all businesses")
         
-        submissions = self.data_manager.get_submissions_for_checking()
+        # One streaming pass over every business instead of a query per business
+        businesses = set()
         
-        # Group by business_id for efficiency
-        businesses = {}
-        for submission in submissions:
-            business_id = submission["business_id"]
-            if business_id not in businesses:
-                businesses[business_id] = []
-            businesses[business_id].append(submission)
+        def submissions() -> Iterator[Dict]:
+            for submission in self.data_manager.iter_submissions_for_checking():
+                businesses.add(submission["business_id"])
+                yield submission
         
-        # Check each business
-        for business_id, business_submissions in businesses.items():
-            self.check_listings_for_business(business_id)
+        self._check_submissions(submissions())
             
         logger.info(f"Completed weekly listing check for {len(businesses)} businesses")
\ No newline at end of file
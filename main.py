@@ -1,27 +1,31 @@
-from fastapi import FastAPI, File, UploadFile, Form, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, Form, BackgroundTasks, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+from types import SimpleNamespace
 from typing import Dict, List, Optional
 import json
 import csv
+import hashlib
 import io
 import os
+import socket
 import logging
+import asyncio
+import threading
 from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from pydantic import BaseModel
 
-from directory_agent import DirectoryAgent
-from data_manager import DataManager
-from listing_checker import ListingChecker
+from data_manager import DataManager, EXPORT_COLUMNS, UPLOAD_MODES
+from async_data_manager import AsyncDataManager
+from retention import RetentionManager
+from helper.url_utils import canonicalize_url, directory_domain, is_valid_url
 
-# Setup logging
+# Setup logging; the log file is only opened once something is logged
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler("seo_agent.log"),
+        logging.FileHandler("seo_agent.log", delay=True),
         logging.StreamHandler()
     ]
 )
@@ -35,11 +39,121 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Initialize components
 data_manager = DataManager("seo_data.db")
-listing_checker = ListingChecker(data_manager)
+# Endpoints go through the async facade so SQLite I/O stays off the event loop
+async_data_manager = AsyncDataManager(data_manager)
+# Strips, compresses and archives old submission history daily
+retention_manager = RetentionManager.from_env(data_manager)
 
-# Initialize scheduler
-scheduler = BackgroundScheduler()
-scheduler.start()
+# BROWSER_TABS > 1 runs that many directories at once as tabs of one Chrome
+# per component instead of one browser per job
+BROWSER_TABS = int(os.environ.get("BROWSER_TABS", "1"))
+
+# WORKER=0 marks an API-only process: it runs no scheduled jobs (listing
+# check, retention) and does not resume interrupted submissions, so several
+# API processes can share one database with a single worker
+WORKER = os.environ.get("WORKER", "1").strip().lower() not in ("0", "false", "no", "off")
+
+# WARM_UP=0 skips loading the browser stack at startup; it is then built on
+# first use. Defaults to off for API-only processes
+WARM_UP = os.environ.get("WARM_UP", "1" if WORKER else "0").strip().lower() not in ("0", "false", "no", "off")
+
+_components = None
+_components_lock = threading.Lock()
+scheduler = None
+# Guards scheduler against a warm-up thread starting it during shutdown
+_scheduler_lock = threading.Lock()
+_shutting_down = False
+# Held so the background warm-up task is not garbage-collected while it runs
+_warm_up_task = None
+
+
+def components() -> SimpleNamespace:
+    """
+    Selenium-backed components, built once on first use.
+
+    Importing Selenium, the crawler and the session store is what makes
+    startup slow, so none of it happens until a submission, listing check
+    or the background warm-up needs it.
+    """
+    global _components
+    if _components is None:
+        with _components_lock:
+            if _components is None:
+                _components = _build_components()
+    return _components
+
+
+def _build_components() -> SimpleNamespace:
+    from directory_agent import DirectoryAgent
+    from listing_checker import ListingChecker
+    from directory_crawler import DirectoryCrawler
+    from session_store import SessionStore
+    from page_recorder import PageRecorder
+    from tab_pool import TabPool
+    from browser_watchdog import BrowserWatchdog
+    from helper.browser_profile import BrowserProfile
+
+    session_store = SessionStore(data_manager)
+    watchdog = BrowserWatchdog(data_manager)
+    # RECORD_PAGES=1 archives every submission and listing check for offline replay
+    page_recorder = PageRecorder.from_env()
+
+    submission_tabs = TabPool(BrowserProfile.from_env(), max_tabs=BROWSER_TABS, watchdog=watchdog) if BROWSER_TABS > 1 else None
+    listing_tabs = TabPool(BrowserProfile.from_env(default_headless=True), max_tabs=BROWSER_TABS, watchdog=watchdog) if BROWSER_TABS > 1 else None
+
+    listing_checker = ListingChecker(data_manager, session_store=session_store, tab_pool=listing_tabs, watchdog=watchdog,
+                                     recorder=page_recorder)
+    directory_crawler = DirectoryCrawler(data_manager)
+
+    logger.info("Browser components initialized")
+    return SimpleNamespace(
+        DirectoryAgent=DirectoryAgent,
+        session_store=session_store,
+        watchdog=watchdog,
+        page_recorder=page_recorder,
+        submission_tabs=submission_tabs,
+        listing_tabs=listing_tabs,
+        listing_checker=listing_checker,
+        directory_crawler=directory_crawler,
+    )
+
+
+def start_scheduler():
+    """Start the scheduler and schedule the weekly listing check and daily retention run."""
+    global scheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from apscheduler.triggers.interval import IntervalTrigger
+
+    with _scheduler_lock:
+        if _shutting_down or scheduler:
+            return
+        scheduler = BackgroundScheduler()
+        scheduler.start()
+        
+        # Schedule weekly listing checker
+        scheduler.add_job(
+            lambda: components().listing_checker.check_all_listings(),
+            trigger=IntervalTrigger(weeks=1),
+            id='listing_checker',
+            name='Weekly Listing Check',
+            replace_existing=True
+        )
+        logger.info("Weekly listing checker scheduled")
+        
+        scheduler.add_job(
+            retention_manager.run,
+            trigger=IntervalTrigger(days=1),
+            id='retention',
+            name='Daily Retention Run',
+            replace_existing=True
+        )
+
+# Attempts per directory; retries resume from the last checkpointed stage
+MAX_SUBMISSION_ATTEMPTS = int(os.environ.get("MAX_SUBMISSION_ATTEMPTS", "3"))
+
+# Owner of the submissions this process claims, so workers sharing the
+# database never run the same directory twice
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
 
 # Models
 class BusinessData(BaseModel):
@@ -60,95 +174,312 @@ class BusinessData(BaseModel):
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database and schedule weekly tasks on startup."""
+    """Initialize the database; everything heavier warms up in the background."""
+    global _warm_up_task
     data_manager.initialize_database()
     
-    # Schedule weekly listing checker
-    scheduler.add_job(
-        listing_checker.check_all_listings,
-        trigger=IntervalTrigger(weeks=1),
-        id='listing_checker',
-        name='Weekly Listing Check',
-        replace_existing=True
-    )
-    logger.info("Weekly listing checker scheduled")
+    _warm_up_task = asyncio.create_task(warm_up())
+
+async def warm_up():
+    """
+    Preload the browser stack and, in a worker, start the scheduler and
+    resume interrupted work, once serving has started.
+
+    With WARM_UP=0 the browser stack is built when something first needs
+    it; with WORKER=0 nothing but the preload happens here.
+    """
+    try:
+        if WARM_UP:
+            await asyncio.to_thread(components)
+        if not WORKER:
+            return
+        await asyncio.to_thread(start_scheduler)
+        
+        # Pick up submissions a previous worker stopped part-way through
+        await resume_interrupted_submissions()
+    except Exception as e:
+        logger.error(f"Error during warm-up: {str(e)}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up on shutdown."""
-    scheduler.shutdown()
+    global _shutting_down
+    # Stop the warm-up first so it cannot start the scheduler or resume work afterwards
+    if _warm_up_task:
+        _warm_up_task.cancel()
+        await asyncio.gather(_warm_up_task, return_exceptions=True)
+    with _scheduler_lock:
+        _shutting_down = True
+        if scheduler:
+            scheduler.shutdown()
+    async_data_manager.close()
+    if _components:
+        for tab_pool in (_components.submission_tabs, _components.listing_tabs):
+            if tab_pool:
+                tab_pool.close()
+
+_index_cache = {}
+
+def _load_index() -> Dict:
+    """index.html with its ETag, re-read only when the file changes."""
+    path = "static/index.html"
+    mtime = os.stat(path).st_mtime_ns
+    if _index_cache.get("mtime") != mtime:
+        with open(path, "rb") as f:
+            body = f.read()
+        _index_cache.update(mtime=mtime, body=body, etag=f'"{hashlib.sha1(body).hexdigest()}"')
+    return _index_cache
 
 @app.get("/", response_class=HTMLResponse)
-async def get_home():
-    """Serve the home page."""
-    with open("static/index.html", "r") as f:
-        return f.read()
+async def get_home(request: Request):
+    """Serve the home page from memory; browsers revalidate it with its ETag."""
+    index = _load_index()
+    headers = {"ETag": index["etag"], "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == index["etag"]:
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(index["body"], headers=headers)
 
 @app.post("/submit-business-data")
 async def submit_business_data(business_data: BusinessData):
     """Endpoint to submit business data."""
-    business_id = data_manager.save_business_data(business_data.dict())
+    business_id = await async_data_manager.save_business_data(business_data.dict())
     return {"status": "success", "business_id": business_id}
 
 @app.post("/upload-csv")
 async def upload_csv_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    business_id: int = Form(...)
+    business_id: int = Form(...),
+    mode: str = Form("skip")
 ):
-    """Endpoint to upload CSV of directory URLs."""
+    """
+    Endpoint to upload CSV of directory URLs.
+
+    Directories the business already has are matched on their canonical URL;
+    `mode` is "skip" (leave them alone), "refresh" (retry the ones that did
+    not succeed) or "force" (resubmit all of them).
+    """
+    if mode not in UPLOAD_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(UPLOAD_MODES)}")
+    
     content = await file.read()
     csv_content = content.decode('utf-8')
     csv_reader = csv.reader(io.StringIO(csv_content))
     
-    urls = []
+    uploaded = []
+    seen = set()
+    rejected = []
+    report = {"created": 0, "refreshed": 0, "forced": 0, "skipped": 0, "duplicates": 0, "rejected": 0}
     for row in csv_reader:
         if row and row[0].strip():
             url = row[0].strip()
+            if not is_valid_url(url):
+                rejected.append(url)
+                report["rejected"] += 1
+                continue
+            canonical_url = canonicalize_url(url)
+            if canonical_url in seen:
+                report["duplicates"] += 1
+                continue
+            seen.add(canonical_url)
+            uploaded.append(url)
+    
+    urls = []
+    actions = await async_data_manager.add_directory_urls(business_id, uploaded, mode=mode)
+    for url, action in zip(uploaded, actions):
+        report[action] += 1
+        if action != "skipped":
             urls.append(url)
-            data_manager.add_directory_url(business_id, url)
     
-    # Start processing in background
-    background_tasks.add_task(process_directories, business_id, urls)
+    # Start processing in background; an upload of known directories loads no browser
+    if urls:
+        background_tasks.add_task(process_directories, business_id, urls)
     
-    return {"status": "success", "message": f"Processing {len(urls)} directories in the background"}
+    avoided = report["skipped"] + report["duplicates"]
+    return {
+        "status": "success",
+        "message": f"Processing {len(urls)} directories in the background, {avoided} already known or repeated",
+        "report": report,
+        "rejected": rejected
+    }
 
 async def process_directories(business_id: int, urls: List[str]):
     """Background task to process directory submissions."""
-    business_data = data_manager.get_business_data(business_id)
+    business_data = await async_data_manager.get_business_data(business_id)
+    
+    # Discover submit and search endpoints for every directory up front
+    browser = await asyncio.to_thread(components)
+    profiles = await browser.directory_crawler.crawl(urls)
+    
+    def process(url):
+        process_directory(business_id, business_data, url, profiles.get(directory_domain(url)))
+    
+    # Selenium blocks, so keep it off the event loop
+    if browser.submission_tabs:
+        await asyncio.to_thread(browser.submission_tabs.map, process, urls)
+    else:
+        for url in urls:
+            await asyncio.to_thread(process, url)
+
+def process_directory(business_id: int, business_data: Dict, url: str, directory_profile: Optional[Dict] = None):
+    """Submit to one directory, resuming from the last completed stage on retries."""
+    def save_checkpoint(checkpoint):
+        data_manager.save_submission_checkpoint(business_id, url, checkpoint)
+    
+    if not data_manager.claim_submission(business_id, url, WORKER_ID):
+        logger.info(f"Skipping {url}: already being processed")
+        return
     
-    for url in urls:
-        try:
-            logger.info(f"Processing directory: {url}")
-            agent = DirectoryAgent(business_data)
-            result = agent.submit_to_directory(url)
-            
-            # Save result
-            data_manager.update_submission_status(
-                business_id=business_id,
-                directory_url=url,
-                status=result["status"],
-                response_data=result
+    try:
+        checkpoint = data_manager.get_submission_checkpoint(business_id, url)
+        attempts = checkpoint.get("attempts", 0) if checkpoint else 0
+        result = None
+        while attempts < MAX_SUBMISSION_ATTEMPTS:
+            attempts += 1
+            logger.info(f"Processing directory: {url} (attempt {attempts})")
+            browser = components()
+            agent = browser.DirectoryAgent(business_data, business_id=business_id, session_store=browser.session_store,
+                                           tab_pool=browser.submission_tabs, watchdog=browser.watchdog,
+                                           recorder=browser.page_recorder)
+            result = agent.submit_to_directory(
+                url,
+                directory_profile=directory_profile,
+                checkpoint=checkpoint,
+                on_checkpoint=save_checkpoint
             )
-        except Exception as e:
-            logger.error(f"Error processing {url}: {str(e)}")
-            data_manager.update_submission_status(
-                business_id=business_id,
-                directory_url=url,
-                status="error",
-                response_data={"error": str(e)}
+            if result["status"] != "error":
+                # The attempt ran to completion, nothing left to resume
+                save_checkpoint(None)
+                break
+            checkpoint = data_manager.get_submission_checkpoint(business_id, url)
+        
+        if result is None:
+            logger.info(f"Giving up on {url} after {MAX_SUBMISSION_ATTEMPTS} attempts")
+            result = {"status": "error", "error": f"Gave up after {MAX_SUBMISSION_ATTEMPTS} attempts"}
+        if result["status"] == "error":
+            # Out of attempts: the row is finished (so retention can age it)
+            # until a refresh upload retries it
+            save_checkpoint(None)
+        
+        # Save result
+        async_data_manager.queue_status_update(
+            business_id=business_id,
+            directory_url=url,
+            status=result["status"],
+            response_data=result
+        )
+    except Exception as e:
+        logger.error(f"Error processing {url}: {str(e)}")
+        async_data_manager.queue_status_update(
+            business_id=business_id,
+            directory_url=url,
+            status="error",
+            response_data={"error": str(e)}
+        )
+
+async def resume_interrupted_submissions():
+    """Resume submissions left part-way by a previous worker from their last completed stage."""
+    pending = {}
+    for submission in await async_data_manager.get_resumable_submissions():
+        if submission["checkpoint"].get("attempts", 0) < MAX_SUBMISSION_ATTEMPTS:
+            pending.setdefault(submission["business_id"], []).append(submission["directory_url"])
+        else:
+            # Left behind by older versions, which kept the checkpoint after the last attempt
+            await async_data_manager.save_submission_checkpoint(
+                submission["business_id"], submission["directory_url"], None
             )
+    
+    for business_id, urls in pending.items():
+        logger.info(f"Resuming {len(urls)} interrupted submissions for business {business_id}")
+        await process_directories(business_id, urls)
 
 @app.get("/status/{business_id}")
 async def get_status(business_id: int):
     """Get submission statuses for a business."""
-    statuses = data_manager.get_all_submission_statuses(business_id)
-    return {"statuses": statuses}
+    statuses, watchdog_events = await asyncio.gather(
+        async_data_manager.get_all_submission_statuses(business_id),
+        async_data_manager.get_watchdog_events(business_id)
+    )
+    return {"statuses": statuses, "watchdog_events": watchdog_events}
+
+@app.get("/summary")
+@app.get("/summary/{business_id}")
+async def get_summary(business_id: Optional[int] = None, days: int = 30):
+    """Submission totals for the dashboard, for one business or across all of them."""
+    return await async_data_manager.get_submission_summary(business_id, days)
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+def export_lines(rows, export_format: str, batch_size: int = 500):
+    """Encode submission rows as NDJSON or CSV text, a batch of rows per chunk."""
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+    
+    for count, row in enumerate(rows, 1):
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row))
+            buffer.write("\n")
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+@app.get("/export/submissions")
+async def export_submissions(
+    format: str = "ndjson",
+    business_id: Optional[List[int]] = Query(None),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    status: Optional[List[str]] = Query(None),
+    listing_status: Optional[List[str]] = Query(None),
+    include_archived: bool = False
+):
+    """
+    Stream submissions and listing outcomes as NDJSON or CSV.
+
+    `business_id`, `status` and `listing_status` may be repeated; `since` and
+    `until` bound created_at. `include_archived=true` adds submissions moved
+    to the archive by retention. Rows are read and sent in chunks, so memory
+    use does not grow with the size of the export.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_MEDIA_TYPES)}")
+    
+    rows = data_manager.iter_submissions(
+        business_ids=business_id, since=since, until=until,
+        statuses=status, listing_statuses=listing_status, include_archived=include_archived
+    )
+    # A plain generator is iterated in the threadpool, keeping SQLite off the event loop
+    return StreamingResponse(
+        export_lines(rows, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="submissions.{format}"'}
+    )
+
+@app.post("/retention/run")
+async def trigger_retention(background_tasks: BackgroundTasks):
+    """Strip, compress and archive old submissions now instead of waiting for the daily run."""
+    background_tasks.add_task(retention_manager.run)
+    return {"status": "success", "message": "Retention run triggered"}
+
+@app.get("/retention/reports")
+async def get_retention_reports(limit: int = 10):
+    """What the most recent retention runs reclaimed, newest first."""
+    return {"reports": await async_data_manager.get_retention_runs(limit)}
 
 @app.post("/check-listings/{business_id}")
 async def trigger_listing_check(business_id: int, background_tasks: BackgroundTasks):
     """Trigger a manual listing check for a business."""
-    background_tasks.add_task(listing_checker.check_listings_for_business, business_id)
+    def check_listings():
+        components().listing_checker.check_listings_for_business(business_id)
+    
+    background_tasks.add_task(check_listings)
     return {"status": "success", "message": "Listing check triggered"}
 
 if __name__ == "__main__":
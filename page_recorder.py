@@ -0,0 +1,190 @@
+from bs4 import BeautifulSoup
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+from helper.field_matcher import collect_controls, field_matcher
+from helper.page_analysis import classify_listing, find_submission_link, is_login_required, is_submission_successful
+from helper.url_utils import directory_domain
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".json.gz"
+
+# Outcomes that replay() recomputes and compare() checks against the live run
+REPLAYED_OUTCOMES = ["submission_link", "login_required", "fields", "success", "listing_status"]
+
+
+def network_exchanges(driver) -> List[Dict[str, Any]]:
+    """Requests and responses of the page, read (and drained) from Chrome's performance log."""
+    exchanges: Dict[str, Dict[str, Any]] = {}
+    for entry in driver.get_log("performance"):
+        message = json.loads(entry["message"])["message"]
+        params = message.get("params", {})
+        method = message["method"]
+        if method == "Network.requestWillBeSent":
+            request = params["request"]
+            exchanges[params["requestId"]] = {
+                "url": request["url"],
+                "method": request["method"],
+                "type": params.get("type"),
+            }
+        elif method == "Network.responseReceived":
+            response = params["response"]
+            exchange = exchanges.setdefault(params["requestId"], {"url": response["url"]})
+            exchange["status"] = response.get("status")
+            exchange["mime_type"] = response.get("mimeType")
+        elif method == "Network.loadingFinished":
+            exchange = exchanges.setdefault(params["requestId"], {})
+            exchange["bytes"] = int(params.get("encodedDataLength", 0))
+        elif method == "Network.loadingFailed":
+            exchange = exchanges.setdefault(params["requestId"], {})
+            exchange["error"] = params.get("blockedReason") or params.get("errorText")
+    return list(exchanges.values())
+
+
+class Recording:
+    def __init__(self, path: str, kind: str, url: str, meta: Dict[str, Any]):
+        """
+        One recorded submission or listing check.
+
+        Every snapshot stores the page URL, the form control descriptors and a
+        reference to its HTML; identical HTML is kept once per archive.
+        """
+        self.path = path
+        self.data = {
+            "version": ARCHIVE_VERSION,
+            "kind": kind,
+            "url": url,
+            "meta": meta,
+            "recorded_at": datetime.now().isoformat(),
+            "snapshots": [],
+            "pages": {},
+            "network": [],
+            "outcome": {},
+        }
+
+    def snapshot(self, driver, step: str, controls: Optional[List[Dict]] = None):
+        """Capture the current page; `controls` reuses descriptors the caller already collected."""
+        try:
+            html = driver.page_source
+            url = driver.current_url
+            if controls is None:
+                controls = collect_controls(driver)
+        except Exception as e:
+            logger.debug(f"Could not snapshot {step}: {str(e)}")
+            return
+
+        digest = hashlib.sha1(html.encode()).hexdigest()
+        self.data["pages"].setdefault(digest, html)
+        self.data["snapshots"].append({
+            "step": step,
+            "url": url,
+            "page": digest,
+            "controls": [{k: v for k, v in control.items() if k != "element"} for control in controls],
+        })
+
+    def record(self, **outcome):
+        """Store what the live run decided, for replay to compare against."""
+        self.data["outcome"].update(outcome)
+
+    def save(self, driver=None):
+        """Write the archive; failures are logged, never raised into the run."""
+        # A tab shares its browser's performance log with the other tabs
+        if driver is not None and not hasattr(driver, "handle"):
+            try:
+                self.data["network"] = network_exchanges(driver)
+            except Exception as e:
+                logger.debug(f"No network log for {self.data['url']}: {str(e)}")
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(self.data, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save recording {self.path}: {str(e)}")
+
+
+class PageRecorder:
+    def __init__(self, directory: str = "recordings"):
+        """Writes one gzipped JSON archive per run under `directory`/<domain>/."""
+        self.directory = directory
+
+    @classmethod
+    def from_env(cls) -> Optional["PageRecorder"]:
+        """A recorder when RECORD_PAGES=1, writing to RECORD_PAGES_DIR (default "recordings")."""
+        if os.environ.get("RECORD_PAGES", "").strip().lower() not in ("1", "true", "yes", "on"):
+            return None
+        return cls(os.environ.get("RECORD_PAGES_DIR", "recordings"))
+
+    def start(self, kind: str, url: str, **meta) -> Recording:
+        """Begin recording a `kind` ("submission" or "listing") run against `url`."""
+        name = f"{kind}-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}{ARCHIVE_SUFFIX}"
+        return Recording(os.path.join(self.directory, directory_domain(url) or "unknown", name), kind, url, meta)
+
+
+def load_recording(path: str) -> Dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_recordings(directory: str) -> Iterator[str]:
+    """Paths of every archive below `directory`, in a stable order."""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(ARCHIVE_SUFFIX):
+                yield os.path.join(root, name)
+
+
+def replay(recording: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Re-run detection, field matching and verification on a recording.
+
+    Uses the same page_analysis and field_matcher code as the live agents,
+    without a browser or network. Each distinct page is parsed once.
+    """
+    soups: Dict[str, BeautifulSoup] = {}
+
+    def soup(digest: str) -> BeautifulSoup:
+        if digest not in soups:
+            soups[digest] = BeautifulSoup(recording["pages"][digest], "html.parser")
+        return soups[digest]
+
+    meta = recording["meta"]
+    outcome = {}
+    for snapshot in recording["snapshots"]:
+        step, url, html = snapshot["step"], snapshot["url"], recording["pages"][snapshot["page"]]
+        if step == "navigate":
+            outcome["submission_link"] = find_submission_link(soup(snapshot["page"]), url)
+        elif step == "submission_page":
+            outcome["login_required"] = is_login_required(soup(snapshot["page"]))
+        elif step == "form":
+            controls = snapshot["controls"]
+            outcome["fields"] = [
+                [controls[position]["name"] or controls[position]["id"], attribute]
+                for position, attribute, score in field_matcher.match(controls, meta.get("attributes"))
+            ]
+        elif step == "result" and recording["kind"] == "submission":
+            outcome["success"] = is_submission_successful(url, html)
+        elif step == "result" and recording["kind"] == "listing":
+            outcome["listing_status"] = classify_listing(html, meta["company_name"], meta["website_url"])
+    return outcome
+
+
+def compare(recording: Dict[str, Any], replayed: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Outcomes whose replayed value differs from the recorded one: {name: {recorded, replayed}}."""
+    replayed = replay(recording) if replayed is None else replayed
+    recorded = recording["outcome"]
+    changes = {}
+    for name in REPLAYED_OUTCOMES:
+        if name in recorded and name in replayed and recorded[name] != replayed[name]:
+            changes[name] = {"recorded": recorded[name], "replayed": replayed[name]}
+    return changes
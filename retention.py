@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bulky parts of response_data that are only useful while a submission is recent
+STRIPPED_KEYS = ["html_content", "wait_timings"]
+
+# Free pages returned to the OS per incremental vacuum step
+VACUUM_STEP_PAGES = 256
+
+# auto_vacuum value of a database in incremental mode
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+class RetentionManager:
+    def __init__(self, data_manager, strip_after: Optional[int] = 14, compress_after: Optional[int] = 90,
+                 archive_after: Optional[int] = 365, batch_size: int = 500, pause: float = 0.05):
+        """
+        Keep submission history small without losing it.
+
+        Finished submissions older than `strip_after` days lose their page
+        HTML and wait timings, after `compress_after` days their remaining
+        response data is zlib-compressed, and after `archive_after` days they
+        move to the archive table. A stage set to None or 0 is skipped. Work
+        is done in batches of `batch_size` rows with a short `pause` between
+        them, so the API and agents keep getting the write lock; freed pages
+        are then returned to the OS with incremental vacuum steps.
+        """
+        self.data_manager = data_manager
+        self.strip_after = strip_after
+        self.compress_after = compress_after
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+        self.pause = pause
+
+    @classmethod
+    def from_env(cls, data_manager) -> "RetentionManager":
+        """Ages in days from RETENTION_STRIP_DAYS, RETENTION_COMPRESS_DAYS and RETENTION_ARCHIVE_DAYS (0 disables)."""
+        return cls(
+            data_manager,
+            strip_after=int(os.environ.get("RETENTION_STRIP_DAYS", "14")),
+            compress_after=int(os.environ.get("RETENTION_COMPRESS_DAYS", "90")),
+            archive_after=int(os.environ.get("RETENTION_ARCHIVE_DAYS", "365")),
+        )
+
+    @staticmethod
+    def _cutoff(days: int) -> str:
+        return (datetime.now() - timedelta(days=days)).isoformat()
+
+    def _rewrite_payloads(self, rewrite, days: int) -> Dict[str, int]:
+        rows = saved = 0
+        after_id = 0
+        while True:
+            count, bytes_saved, after_id = rewrite(self._cutoff(days), STRIPPED_KEYS, after_id, self.batch_size)
+            rows += count
+            saved += bytes_saved
+            if count < self.batch_size:
+                return {"rows": rows, "bytes_saved": saved}
+            time.sleep(self.pause)
+
+    def _archive(self, days: int) -> Dict[str, int]:
+        rows = 0
+        while True:
+            count = self.data_manager.archive_submissions(self._cutoff(days), self.batch_size)
+            rows += count
+            if count < self.batch_size:
+                return {"rows": rows}
+            time.sleep(self.pause)
+
+    def _vacuum(self) -> int:
+        """Return free pages to the OS in small steps; returns the pages freed."""
+        stats = self.data_manager.get_database_stats()
+        if stats["auto_vacuum"] != AUTO_VACUUM_INCREMENTAL:
+            # Databases created before incremental mode need one full rewrite
+            logger.info("Converting database to incremental auto-vacuum")
+            self.data_manager.enable_incremental_vacuum()
+            return stats["freelist_count"]
+
+        free_pages = stats["freelist_count"]
+        remaining = free_pages
+        while remaining:
+            left = self.data_manager.incremental_vacuum(VACUUM_STEP_PAGES)
+            if left >= remaining:
+                break
+            remaining = left
+            time.sleep(self.pause)
+        return free_pages - remaining
+
+    def run(self) -> Dict:
+        """Run every enabled stage, vacuum, and store and return a report of what was reclaimed."""
+        started = time.monotonic()
+        before = self.data_manager.get_database_stats()
+
+        report = {"started_at": datetime.now().isoformat()}
+        if self.strip_after:
+            report["stripped"] = self._rewrite_payloads(self.data_manager.strip_response_payloads, self.strip_after)
+        if self.compress_after:
+            report["compressed"] = self._rewrite_payloads(self.data_manager.compress_response_payloads, self.compress_after)
+        if self.archive_after:
+            report["archived"] = self._archive(self.archive_after)
+
+        report["pages_freed"] = self._vacuum()
+        self.data_manager.checkpoint_wal()
+
+        after = self.data_manager.get_database_stats()
+        report["size_before"] = before["page_count"] * before["page_size"]
+        report["size_after"] = after["page_count"] * after["page_size"]
+        report["bytes_reclaimed"] = report["size_before"] - report["size_after"]
+        report["seconds"] = round(time.monotonic() - started, 2)
+
+        self.data_manager.record_retention_run(report)
+        logger.info(
+            f"Retention run reclaimed {report['bytes_reclaimed'] / 1024 ** 2:.1f} MB "
+            f"({report['size_before'] / 1024 ** 2:.1f} -> {report['size_after'] / 1024 ** 2:.1f} MB)"
+        )
+        return report
@@ -0,0 +1,147 @@
+from cryptography.fernet import Fernet, InvalidToken
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import json
+import logging
+import os
+
+from helper.url_utils import directory_domain
+
+logger = logging.getLogger(__name__)
+
+KEY_FILE = ".session_key"
+
+# Replays saved localStorage before any page script runs, only on the saved origin
+LOCAL_STORAGE_JS = """
+(function() {
+    if (window.location.origin !== %s) { return; }
+    var items = %s;
+    for (var key in items) {
+        if (window.localStorage.getItem(key) === null) {
+            window.localStorage.setItem(key, items[key]);
+        }
+    }
+})();
+"""
+
+
+def load_encryption_key() -> bytes:
+    """
+    Key used to encrypt sessions at rest.
+
+    Read from SESSION_ENCRYPTION_KEY, otherwise from a local key file that is
+    generated with owner-only permissions on first use.
+    """
+    key = os.environ.get("SESSION_ENCRYPTION_KEY")
+    if key:
+        return key.encode()
+
+    if not os.path.exists(KEY_FILE):
+        logger.warning(f"SESSION_ENCRYPTION_KEY not set, generating {KEY_FILE}")
+        fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(Fernet.generate_key())
+
+    with open(KEY_FILE, "rb") as f:
+        return f.read().strip()
+
+
+class SessionStore:
+    def __init__(self, data_manager, key: Optional[bytes] = None, max_age: timedelta = timedelta(days=30)):
+        """Encrypted cookie and localStorage store keyed by (business_id, directory domain)."""
+        self.data_manager = data_manager
+        self.fernet = Fernet(key or load_encryption_key())
+        self.max_age = max_age
+
+    def save(self, driver, business_id: int, url: str):
+        """Capture the logged-in session of the current page."""
+        try:
+            cookies = driver.get_cookies()
+            origin = driver.execute_script("return window.location.origin")
+            local_storage = driver.execute_script(
+                "var items = {};"
+                "for (var i = 0; i < window.localStorage.length; i++) {"
+                "  var key = window.localStorage.key(i); items[key] = window.localStorage.getItem(key);"
+                "}"
+                "return items;"
+            ) or {}
+        except Exception as e:
+            logger.warning(f"Could not capture session for {url}: {str(e)}")
+            return
+
+        # Nothing of the session survives once its last persistent cookie expires;
+        # sessions made only of session cookies are kept for at most max_age
+        expires_at = datetime.now() + self.max_age
+        expiries = [c["expiry"] for c in cookies if c.get("expiry")]
+        if expiries:
+            expires_at = min(expires_at, datetime.fromtimestamp(max(expiries)))
+
+        payload = json.dumps({"cookies": cookies, "origin": origin, "local_storage": local_storage})
+        self.data_manager.save_browser_session(
+            business_id, directory_domain(url), self.fernet.encrypt(payload.encode()), expires_at.isoformat()
+        )
+        logger.info(f"Saved session for business {business_id} on {directory_domain(url)}")
+
+    def load(self, business_id: int, url: str) -> Optional[Dict[str, Any]]:
+        """Decrypted session, or None if missing, expired or unreadable."""
+        domain = directory_domain(url)
+        row = self.data_manager.get_browser_session(business_id, domain)
+        if not row:
+            return None
+
+        if row["expires_at"] and datetime.fromisoformat(row["expires_at"]) <= datetime.now():
+            logger.info(f"Stored session for business {business_id} on {domain} has expired")
+            self.invalidate(business_id, url)
+            return None
+
+        try:
+            return json.loads(self.fernet.decrypt(row["payload"]))
+        except InvalidToken:
+            logger.warning(f"Stored session for business {business_id} on {domain} cannot be decrypted")
+            self.invalidate(business_id, url)
+            return None
+
+    def restore(self, driver, business_id: int, url: str) -> bool:
+        """
+        Load a stored session into `driver` before its first navigation.
+
+        Cookies go in through CDP so no extra page load is needed; localStorage
+        is replayed by a script that runs ahead of the page's own scripts.
+        """
+        session = self.load(business_id, url)
+        if not session:
+            return False
+
+        try:
+            for cookie in session["cookies"]:
+                params = {
+                    "name": cookie["name"],
+                    "value": cookie["value"],
+                    "domain": cookie.get("domain"),
+                    "path": cookie.get("path", "/"),
+                    "secure": cookie.get("secure", False),
+                    "httpOnly": cookie.get("httpOnly", False),
+                }
+                if not params["domain"]:
+                    del params["domain"]
+                    params["url"] = url
+                if cookie.get("expiry"):
+                    params["expires"] = cookie["expiry"]
+                if cookie.get("sameSite"):
+                    params["sameSite"] = cookie["sameSite"]
+                driver.execute_cdp_cmd("Network.setCookie", params)
+
+            if session["local_storage"]:
+                driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+                    "source": LOCAL_STORAGE_JS % (json.dumps(session["origin"]), json.dumps(session["local_storage"]))
+                })
+        except Exception as e:
+            logger.warning(f"Could not restore session for {url}: {str(e)}")
+            return False
+
+        logger.info(f"Restored session for business {business_id} on {directory_domain(url)}")
+        return True
+
+    def invalidate(self, business_id: int, url: str):
+        """Forget the stored session, e.g. after the directory logged us out."""
+        self.data_manager.delete_browser_session(business_id, directory_domain(url))
@@ -0,0 +1,342 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
+from typing import Any, Callable, Iterable, List, Optional
+import itertools
+import json
+import logging
+import threading
+import time
+
+import websocket
+
+from helper.browser_profile import BrowserProfile
+
+logger = logging.getLogger(__name__)
+
+# Marks the old document so a navigation can be detected without blocking on it
+NAVIGATE_JS = "window.__seoAgentLeaving = true; window.location.assign(arguments[0]);"
+LOAD_STATE_EXPRESSION = "window.__seoAgentLeaving ? 'leaving' : document.readyState"
+LOAD_STATE_JS = f"return {LOAD_STATE_EXPRESSION};"
+
+
+def _unwrap(value):
+    if isinstance(value, TabElement):
+        return value._element
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _unwrap(v) for k, v in value.items()}
+    return value
+
+
+class DevToolsSession:
+    def __init__(self, address: str, target_id: str, timeout: float = 10):
+        """
+        A DevTools connection of its own to one tab.
+
+        chromedriver runs one command at a time and waits for a tab's pending
+        navigation before the next, so a load sent through it holds up every
+        other tab; commands sent here bypass its queue and the pool lock.
+        """
+        self._socket = websocket.create_connection(
+            f"ws://{address}/devtools/page/{target_id}", timeout=timeout, suppress_origin=True
+        )
+        self._ids = itertools.count(1)
+
+    def send(self, method: str, params: Optional[dict] = None) -> dict:
+        """Run a CDP command and return its result; events arriving meanwhile are dropped."""
+        command_id = next(self._ids)
+        self._socket.send(json.dumps({"id": command_id, "method": method, "params": params or {}}))
+        while True:
+            message = json.loads(self._socket.recv())
+            if message.get("id") != command_id:
+                continue
+            if "error" in message:
+                raise WebDriverException(f"{method} failed: {message['error'].get('message')}")
+            return message.get("result", {})
+
+    def evaluate(self, expression: str):
+        result = self.send("Runtime.evaluate", {"expression": expression, "returnByValue": True})
+        if "exceptionDetails" in result:
+            raise WebDriverException(f"Script failed: {result['exceptionDetails'].get('text')}")
+        return result["result"].get("value")
+
+    def close(self):
+        try:
+            self._socket.close()
+        except Exception:
+            pass
+
+
+class _TabProxy:
+    """Runs every WebDriver command with the pool lock held and this tab focused."""
+
+    def __init__(self, tab: "TabDriver", target):
+        self._tab = tab
+        self._target = target
+
+    def _wrap(self, value):
+        if isinstance(value, WebElement):
+            return TabElement(self._tab, value)
+        if isinstance(value, list):
+            return [self._wrap(v) for v in value]
+        # execute_script can return elements inside objects, e.g. collect_controls
+        if isinstance(value, dict):
+            return {k: self._wrap(v) for k, v in value.items()}
+        return value
+
+    def __getattr__(self, name):
+        tab = self._tab
+        with tab.pool.lock:
+            tab.pool._activate(tab.handle)
+            attr = getattr(self._target, name)
+            if not callable(attr):
+                return self._wrap(attr)
+
+        def call(*args, **kwargs):
+            with tab.pool.lock:
+                tab.pool._activate(tab.handle)
+                result = attr(*_unwrap(args), **{k: _unwrap(v) for k, v in kwargs.items()})
+                return self._wrap(result)
+
+        return call
+
+
+class TabElement(_TabProxy):
+    def __init__(self, tab: "TabDriver", element: WebElement):
+        """A WebElement that focuses its own tab before every command."""
+        super().__init__(tab, element)
+        self._element = element
+
+
+class TabDriver(_TabProxy):
+    def __init__(self, pool: "TabPool", handle: str, context_id: Optional[str]):
+        """Driver-like view of one tab (and its isolated browser context) in a shared Chrome."""
+        self.pool = pool
+        self.handle = handle
+        self.context_id = context_id
+        self._devtools = None
+        super().__init__(self, pool.driver)
+
+    def _devtools_session(self) -> Optional[DevToolsSession]:
+        if self._devtools is None:
+            address = self.pool.devtools_address()
+            if address:
+                try:
+                    self._devtools = DevToolsSession(address, self.handle, timeout=self.pool.page_load_timeout)
+                except (OSError, websocket.WebSocketException) as e:
+                    logger.debug(f"No DevTools connection to tab, loading through chromedriver: {str(e)}")
+        return self._devtools
+
+    def get(self, url: str):
+        """
+        Navigate without holding the browser while the page loads.
+
+        The load is driven over the tab's own DevTools connection, so other
+        tabs keep running commands during this tab's network wait.
+        """
+        session = self._devtools_session()
+        if session is None:
+            return self._get_through_driver(url)
+
+        deadline = time.monotonic() + self.pool.page_load_timeout
+        try:
+            session.evaluate("window.__seoAgentLeaving = true")
+            navigation = session.send("Page.navigate", {"url": url})
+            if navigation.get("errorText"):
+                # Like driver.get, an unreachable page still loads Chrome's error page
+                logger.debug(f"Navigation to {url} failed: {navigation['errorText']}")
+            while time.monotonic() < deadline:
+                try:
+                    state = session.evaluate(LOAD_STATE_EXPRESSION)
+                except WebDriverException:
+                    # Between documents there is nothing to run the script in
+                    state = None
+                if state in ("interactive", "complete"):
+                    return
+                time.sleep(self.pool.poll_interval)
+        except (OSError, websocket.WebSocketException) as e:
+            raise WebDriverException(f"Lost DevTools connection to tab loading {url}: {str(e)}")
+        raise TimeoutException(f"Timed out loading {url} in tab")
+
+    def _get_through_driver(self, url: str):
+        # The lock is only taken for short polls, but chromedriver may still
+        # hold other tabs' commands until this navigation settles
+        with self.pool.lock:
+            self.pool._activate(self.handle)
+            self.pool.driver.execute_script(NAVIGATE_JS, url)
+
+        deadline = time.monotonic() + self.pool.page_load_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.pool.poll_interval)
+            with self.pool.lock:
+                self.pool._activate(self.handle)
+                try:
+                    state = self.pool.driver.execute_script(LOAD_STATE_JS)
+                except Exception:
+                    # Between documents there is nothing to run the script in
+                    continue
+            if state in ("interactive", "complete"):
+                return
+        raise TimeoutException(f"Timed out loading {url} in tab")
+
+    def quit(self):
+        """Close this tab and its browser context; the shared browser keeps running."""
+        if self._devtools:
+            self._devtools.close()
+            self._devtools = None
+        self.pool._close_tab(self)
+
+
+class TabPool:
+    def __init__(self, browser_profile: Optional[BrowserProfile] = None, max_tabs: int = 4,
+                 page_load_timeout: float = 30, poll_interval: float = 0.1, watchdog=None):
+        """
+        Run several directories at once as tabs of a single Chrome process.
+
+        Each tab lives in its own CDP browser context, so cookies and storage
+        stay isolated exactly as they would in separate browsers. Chrome is
+        started on first use and restarted when it has died. With a
+        BrowserWatchdog, a browser over its memory budget stops receiving new
+        tabs and is recycled as soon as its open tabs have finished.
+        """
+        self.browser_profile = browser_profile or BrowserProfile.from_env()
+        self.max_tabs = max_tabs
+        self.page_load_timeout = page_load_timeout
+        self.poll_interval = poll_interval
+        self.watchdog = watchdog
+        self.lock = threading.RLock()
+        self._idle = threading.Condition(self.lock)
+        self._open_tabs = 0
+        self.driver = None
+        self._home_handle = None
+        self._current_handle = None
+        self._slots = threading.BoundedSemaphore(max_tabs)
+
+    def _start(self):
+        # Image blocking must stay per-tab (CDP), not a browser-wide pref,
+        # so allow-listed directories can still load images in their tab
+        self.driver = self.browser_profile.create_shared_driver()
+        self._home_handle = self.driver.current_window_handle
+        self._current_handle = self._home_handle
+
+    def _is_alive(self) -> bool:
+        try:
+            self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, reason: str):
+        logger.info(f"Restarting shared browser ({reason})")
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting shared browser: {str(e)}")
+        self.driver = None
+
+    def _ensure_browser(self):
+        """Start, replace or recycle the shared browser before handing out a tab."""
+        if self.driver is not None and not self._is_alive():
+            self._discard("browser died")
+        if self.driver is not None and self.watchdog and self.watchdog.over_memory(self.driver):
+            # Let open tabs finish, then replace the bloated browser
+            while self._open_tabs:
+                self._idle.wait()
+            if self.driver is not None and self.watchdog.over_memory(self.driver):
+                self._discard("memory budget exceeded")
+        if self.driver is None:
+            self._start()
+
+    def devtools_address(self) -> Optional[str]:
+        """host:port of the shared browser's DevTools endpoint, if chromedriver reports it."""
+        try:
+            return self.driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        except (AttributeError, KeyError, TypeError):
+            return None
+
+    def _activate(self, handle: str):
+        if self._current_handle != handle:
+            self.driver.switch_to.window(handle)
+            self._current_handle = handle
+
+    def create_driver(self, url: Optional[str] = None) -> TabDriver:
+        """Open an isolated tab for `url`, waiting for a free slot if all tabs are busy."""
+        self._slots.acquire()
+        try:
+            with self.lock:
+                self._ensure_browser()
+                self._activate(self._home_handle)
+
+                context_id = None
+                try:
+                    context_id = self.driver.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+                    target_id = self.driver.execute_cdp_cmd(
+                        "Target.createTarget", {"url": "about:blank", "browserContextId": context_id}
+                    )["targetId"]
+                    if target_id not in self.driver.window_handles:
+                        raise RuntimeError("chromedriver does not expose the new target as a window")
+                    handle = target_id
+                except Exception as e:
+                    logger.warning(f"Isolated browser context unavailable, tab will share cookies: {str(e)}")
+                    if context_id:
+                        self.driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+                        context_id = None
+                    self.driver.switch_to.new_window("tab")
+                    handle = self.driver.current_window_handle
+
+                self._activate(handle)
+                self.browser_profile.apply_network_rules(self.driver, url)
+                self._open_tabs += 1
+                return TabDriver(self, handle, context_id)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _close_tab(self, tab: TabDriver):
+        try:
+            with self.lock:
+                try:
+                    self._activate(tab.handle)
+                    self.driver.close()
+                finally:
+                    self.driver.switch_to.window(self._home_handle)
+                    self._current_handle = self._home_handle
+                    if tab.context_id:
+                        self.driver.execute_cdp_cmd(
+                            "Target.disposeBrowserContext", {"browserContextId": tab.context_id}
+                        )
+        except Exception as e:
+            logger.debug(f"Error closing tab: {str(e)}")
+        finally:
+            with self.lock:
+                self._open_tabs -= 1
+                self._idle.notify_all()
+            self._slots.release()
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """
+        Run `fn` over `items` with up to `max_tabs` running at once.
+
+        `items` is consumed lazily, a few jobs ahead of the running ones, so
+        a streaming iterator is never read into memory all at once.
+        """
+        results = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_tabs, thread_name_prefix="tab") as executor:
+            for item in items:
+                if len(pending) >= 2 * self.max_tabs:
+                    results.append(pending.popleft().result())
+                pending.append(executor.submit(fn, item))
+            while pending:
+                results.append(pending.popleft().result())
+        return results
+
+    def close(self):
+        """Quit the shared browser."""
+        with self.lock:
+            if self.driver:
+                self.driver.quit()
+                self.driver = None